@@ -1,6 +1,13 @@
 import argparse
+import json
 import sys
-from inkeep_core.client import InkeepClient
+from inkeep_core import metrics
+from inkeep_core.answers import AnswerCache
+from inkeep_core.batch import read_questions, run_batch
+from inkeep_core.client import ConfigNotFound, InkeepClient
+from inkeep_core.fanout import MAX_SOURCES, ask_many
+from inkeep_core.pool import ClientPool
+from inkeep_core.refresher import ConfigRefresher
 from inkeep_core.registry import SiteRegistry
 
 def main():
@@ -28,18 +35,48 @@ def main():
     ask_parser = subparsers.add_parser("ask", help="Ask a single question")
     ask_parser.add_argument("source", help="Alias (e.g. 'langfuse') or URL")
     ask_parser.add_argument("question", help="The question to ask")
+    ask_parser.add_argument("--no-cache", action="store_true", help="Bypass the local answer cache")
+
+    # Multi-source command
+    multi_parser = subparsers.add_parser("multi", help="Ask one question across several sources concurrently")
+    multi_parser.add_argument("sources", help="Comma-separated aliases or URLs (e.g. 'clerk,zitadel,neon')")
+    multi_parser.add_argument("question", help="The question to ask")
+    multi_parser.add_argument("--timeout", type=float, default=60, help="Per-source timeout in seconds (default: 60)")
+
+    # Batch command
+    batch_parser = subparsers.add_parser("batch", help="Answer JSONL {source, question} records from a file or stdin")
+    batch_parser.add_argument("input", nargs="?", default="-", help="JSONL file of questions ('-' for stdin)")
+    batch_parser.add_argument("--output", default="-", help="JSONL file for answers ('-' for stdout)")
+    batch_parser.add_argument("--concurrency", type=int, default=8, help="Questions answered at once (default: 8)")
+    batch_parser.add_argument("--ordered", action="store_true", help="Write answers in input order instead of completion order")
+    batch_parser.add_argument("--no-cache", action="store_true", help="Bypass the local answer cache")
 
     # Chat command
     chat_parser = subparsers.add_parser("chat", help="Start interactive chat")
     chat_parser.add_argument("source", help="Alias (e.g. 'langfuse') or URL")
 
     # Clean cache
-    clean_parser = subparsers.add_parser("clean", help="Clear config cache for a site")
+    clean_parser = subparsers.add_parser("clean", help="Clear config and answer cache for a site")
     clean_parser.add_argument("source", help="Alias or URL")
 
+    # Refresh stale configs
+    refresh_parser = subparsers.add_parser("refresh", help="Re-validate cached site configs older than --max-age")
+    refresh_parser.add_argument("--max-age", type=int, default=43200, help="Age in seconds after which a config is re-validated (default: 43200)")
+    refresh_parser.add_argument("--concurrency", type=int, default=4, help="Sites refreshed at once (default: 4)")
+    refresh_parser.add_argument("--jitter", type=float, default=0, help="Random delay in seconds before each site (default: 0)")
+
     args = parser.parse_args()
+    metrics.configure_from_env()
     registry = SiteRegistry()
 
+    if args.command == "refresh":
+        refresher = ConfigRefresher(max_age=args.max_age, concurrency=args.concurrency, jitter=args.jitter)
+        stale = len(refresher.stale_entries())
+        print(f"🔄 Refreshing {stale} stale configs ...")
+        counts = refresher.run_once()
+        print(f"✅ {counts['revalidated']} revalidated, {counts['rescanned']} rescanned, {counts['failed']} failed")
+        return
+
     # --- Handle Registry Commands ---
 
     if args.command == "list":
@@ -68,6 +105,38 @@ def main():
 
     # --- Handle Interaction Commands ---
 
+    if args.command == "batch":
+        pool = ClientPool(answer_cache=None if args.no_cache else AnswerCache())
+        infile = sys.stdin if args.input == "-" else open(args.input, 'r')
+        outfile = sys.stdout if args.output == "-" else open(args.output, 'w')
+        try:
+            for result in run_batch(pool, registry, read_questions(infile), args.concurrency, args.ordered):
+                outfile.write(json.dumps(result, ensure_ascii=False) + "\n")
+                outfile.flush()
+        finally:
+            if infile is not sys.stdin: infile.close()
+            if outfile is not sys.stdout: outfile.close()
+            pool.clear()
+        return
+
+    if args.command == "multi":
+        sources = list(dict.fromkeys(s.strip() for s in args.sources.split(",") if s.strip()))
+        if len(sources) > MAX_SOURCES:
+            print(f"❌ Error: At most {MAX_SOURCES} sources can be asked at once.")
+            sys.exit(1)
+        print(f"\n❓ Asking {len(sources)} sources: {args.question}\n")
+        pool = ClientPool(answer_cache=AnswerCache())
+        for result in ask_many(pool, registry, sources, args.question, timeout=args.timeout):
+            status = f"{result['latency_ms']} ms"
+            if result["timed_out"]:
+                status += ", timed out"
+            print(f"🤖 {result['source']} ({status})")
+            if result["error"]:
+                print(f"❌ {result['error']}\n")
+            else:
+                print(f"{result['answer']}\n")
+        return
+
     if args.command in ["ask", "chat", "clean"]:
         # Resolve source to URL
         target_url = registry.get_url(args.source)
@@ -76,13 +145,29 @@ def main():
             print("Please provide a valid URL or add it to the registry using 'add'.")
             sys.exit(1)
 
-        client = InkeepClient(target_url)
+        answer_cache = AnswerCache()
+        use_answer_cache = args.command == "ask" and not args.no_cache
+        client = InkeepClient(target_url, answer_cache=answer_cache if use_answer_cache else None)
 
         if args.command == "clean":
             client.cache.clear_config(target_url)
-            print(f"🧹 Cache cleared for {target_url}")
+            removed = answer_cache.invalidate(target_url)
+            print(f"🧹 Cache cleared for {target_url} ({removed} cached answers removed)")
             return
         
+        if args.command == "ask":
+            # ask() 先查答案缓存，未命中时才连接站点（扫描配置、预取 PoW）
+            print(f"\n❓ Asking: {args.question}\n")
+            print("🤖 Answer: ", end="", flush=True)
+            try:
+                for chunk in client.ask(args.question):
+                    print(chunk, end="", flush=True)
+            except ConfigNotFound:
+                print("\n❌ Failed to initialize client. Could not find Inkeep configuration on the site.")
+                sys.exit(1)
+            print("\n")
+            return
+
         # Initialize (scan/load config)
         print(f"🔌 Connecting to {target_url} ...", end=" ")
         if not client.initialize():
@@ -90,14 +175,7 @@ def main():
             sys.exit(1)
         print("Connected.")
 
-        if args.command == "ask":
-            print(f"\n❓ Asking: {args.question}\n")
-            print("🤖 Answer: ", end="", flush=True)
-            for chunk in client.ask(args.question):
-                print(chunk, end="", flush=True)
-            print("\n")
-        
-        elif args.command == "chat":
+        if args.command == "chat":
             print(f"\n💬 Chatting with {client.domain}")
             print("Type 'exit' to quit.\n")
             while True:
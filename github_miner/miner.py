@@ -4,8 +4,11 @@ import json
 import time
 import requests
 import re
+import queue
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
 from urllib.parse import urlparse
 from pathlib import Path
 
@@ -13,15 +16,92 @@ from pathlib import Path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from inkeep_core.extractor import ConfigExtractor
-from inkeep_core.registry import SiteRegistry
-from inkeep_core.client import InkeepClient
+from inkeep_core.registry import SITES_MANIFEST, SiteRegistry, load_default_sites
+from inkeep_core.probe import probe_config
+from inkeep_core.scheduler import HostScheduler, HostThrottled
+from inkeep_core.script_cache import ScriptCache
 
 GITHUB_TOKEN = os.environ.get("MINER_TOKEN") or os.environ.get("GITHUB_TOKEN")
 STATE_FILE = Path("github_miner/state.json")
+SCANNED_FILE = Path("github_miner/scanned_domains.tsv")
+# 超过该天数的域名会被重新扫描（站点可能后来才接入 Inkeep）
+RESCAN_DAYS = int(os.environ.get("MINER_RESCAN_DAYS", 90))
 MAX_RUNTIME_SECONDS = 45 * 60 
+# 常驻扫描线程数；队列满时搜索线程阻塞（背压）
+SCAN_WORKERS = int(os.environ.get("MINER_WORKERS", 20))
+QUEUE_SIZE = SCAN_WORKERS * 5
+# 运行期间定期保存进度，避免意外中断丢失
+SAVE_INTERVAL = 60
+# 到点后等待进行中扫描结束的最长时间
+STOP_GRACE_SECONDS = 120
+# 验证使用独立的有界线程池，最多 VERIFY_WORKERS * 2 个候选排队
+VERIFY_WORKERS = int(os.environ.get("MINER_VERIFY_WORKERS", 4))
 
-# 用于保护文件写入的锁
-registry_lock = threading.Lock()
+# 各站点共享的脚本判定缓存（Inkeep widget CDN、常见框架 chunk 只扫描一次）
+script_cache = ScriptCache()
+# 所有扫描线程共享的按主机限速器：令牌桶 + 429/503 退避 + 自适应超时
+scheduler = HostScheduler()
+
+class ScannedDomains:
+    """
+    已扫描域名索引：按域名排序的 TSV（domain<TAB>YYYY-MM-DD），每行一个域名，
+    git diff 只包含新增/重扫的行。运行中每次扫描只追加一行到 .journal，
+    compact() 时合并进主文件并删除日志；意外中断后 load() 会重放日志。
+    """
+    def __init__(self, path, ttl_days=RESCAN_DAYS):
+        self.path = Path(path)
+        self.journal_path = self.path.with_name(self.path.name + ".journal")
+        self.ttl_days = ttl_days
+        self._dates = {}
+        self._journal = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        for p in (self.path, self.journal_path):
+            if not p.exists(): continue
+            with open(p, 'r') as f:
+                for line in f:
+                    domain, _, day = line.rstrip("\n").partition("\t")
+                    if domain and day:
+                        self._dates[domain] = max(day, self._dates.get(domain, day))
+        return self
+
+    def __contains__(self, domain):
+        """只有在 TTL 内扫描过的域名才算已扫描"""
+        day = self._dates.get(domain)
+        return day is not None and day >= (date.today() - timedelta(days=self.ttl_days)).isoformat()
+
+    def __len__(self):
+        return len(self._dates)
+
+    def add(self, domain, day=None):
+        day = day or date.today().isoformat()
+        with self._lock:
+            self._dates[domain] = day
+            if self._journal is None:
+                self._journal = open(self.journal_path, 'a')
+            self._journal.write(f"{domain}\t{day}\n")
+            self._journal.flush()
+
+    def migrate(self, domains):
+        """从旧版 state.json 的 scanned_domains 列表导入（视为今天扫描过）"""
+        today = date.today().isoformat()
+        with self._lock:
+            for domain in domains:
+                self._dates.setdefault(domain, today)
+        self.compact()
+
+    def compact(self):
+        with self._lock:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp, 'w') as f:
+                f.writelines(f"{domain}\t{self._dates[domain]}\n" for domain in sorted(self._dates))
+            os.replace(tmp, self.path)
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self.journal_path.exists():
+                self.journal_path.unlink()
 
 def load_state():
     if STATE_FILE.exists():
@@ -29,9 +109,8 @@ def load_state():
             state = json.load(f)
             if "last_gradient" not in state: state["last_gradient"] = 1000
             if "max_stars" not in state: state["max_stars"] = 500000
-            if "scanned_domains" not in state: state["scanned_domains"] = []
             return state
-    return {"max_stars": 500000, "scanned_domains": [], "found_sites": [], "last_gradient": 1000}
+    return {"max_stars": 500000, "found_sites": [], "last_gradient": 1000}
 
 def save_state(state):
     with open(STATE_FILE, 'w') as f:
@@ -104,71 +183,73 @@ def search_github(state):
         print(f"❌ Exception: {e}", flush=True)
         return [], max_stars, gradient
 
-def verify_site_chat(url):
-    try:
-        client = InkeepClient(url)
-        for chunk in client.ask("Hello"):
-            if "[Error]" in chunk: return False
-            return True
-    except: return False
-    return False
-
-def update_registry_file(new_site):
-    with registry_lock: # 加锁保护文件写入
-        # 1. 更新 Python Registry
-        py_file = Path("inkeep_core/registry.py")
-        with open(py_file, 'r') as f: content = f.read()
-        alias, url, desc = new_site['alias'], new_site['url'], new_site['desc']
-        if f'"{alias}"' in content: return
-        tag = "} # END_DEFAULT_SITES"
-        tag_index = content.find(tag)
-        if tag_index != -1:
-            prefix = content[:tag_index].rstrip()
-            suffix = content[tag_index:]
-            if not prefix.endswith(","): prefix += ","
-            entry = f'\n    "{alias}": {{\n        "url": "{url}",\n        "description": "{desc}"\n    }}'
-            with open(py_file, 'w') as f: f.write(prefix + entry + "\n" + suffix)
-            print(f"🎉 Python Code Updated: Added {alias}", flush=True)
-
-        # 2. 更新 TypeScript Registry (Web)
-        ts_file = Path("web/src/lib/inkeep/registry.ts")
-        if ts_file.exists():
-            with open(ts_file, 'r') as f: ts_content = f.read()
-            if f'"{alias}"' not in ts_content:
-                ts_tag = "};"
-                ts_tag_index = ts_content.rfind(ts_tag)
-                if ts_tag_index != -1:
-                    ts_prefix = ts_content[:ts_tag_index].rstrip()
-                    ts_suffix = ts_content[ts_tag_index:]
-                    if not ts_prefix.endswith(","): ts_prefix += ","
-                    ts_entry = f'\n  "{alias}": {{\n    url: "{url}",\n    description: "{desc}"\n  }}'
-                    with open(ts_file, 'w') as f: f.write(ts_prefix + ts_entry + "\n" + ts_suffix)
-                    print(f"🌐 Web Code Updated: Added {alias}", flush=True)
-
-def update_readmes():
-    with registry_lock: # 加锁保护文档更新
-        import importlib
-        import inkeep_core.registry
-        importlib.reload(inkeep_core.registry)
-        sites = inkeep_core.registry.DEFAULT_SITES
-        for readme_file in ["README.md", "README_zh.md"]:
-            if not os.path.exists(readme_file): continue
-            is_zh = "zh" in readme_file
-            md_lines = []
-            for alias, info in sites.items():
-                name = alias.capitalize()
-                desc = info['description']
-                if is_zh and (desc.startswith("Docs for ") or desc.startswith("Official docs for ")):
-                    desc = desc.replace("Docs for ", "").replace("Official docs for ", "") + " 官方文档"
-                md_lines.append(f"*   **{name}** ({desc})")
-            
-            md_content = "\n".join(md_lines)
-            with open(readme_file, 'r') as f: text = f.read()
-            pattern = r"(<!-- AUTO-GENERATED-SITES:START -->)(.*?)(<!-- AUTO-GENERATED-SITES:END -->)"
-            replacement = f"\\1\n{md_content}\n\\3"
-            new_text = re.sub(pattern, replacement, text, flags=re.DOTALL)
-            with open(readme_file, 'w') as f: f.write(new_text)
-            print(f"📝 Updated {readme_file}", flush=True)
+def verify_site(candidate):
+    """用扫描得到的配置做一次轻量探测（challenge + 首帧即断开），不再重新扫描站点"""
+    ok, reason = probe_config(candidate["url"], candidate["config"])
+    if ok:
+        print(f"   {candidate['domain']} ✅ VERIFIED", flush=True)
+    else:
+        print(f"   {candidate['domain']} ⚠️ Verification Failed ({reason})", flush=True)
+    return ok
+
+def atomic_write(path, text):
+    """先写临时文件再 rename，中断时不会留下半截文件"""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f: f.write(text)
+    os.replace(tmp, path)
+
+def render_registry_ts(sites):
+    entries = ",\n".join(
+        f'  {json.dumps(alias, ensure_ascii=False)}: {{\n'
+        f'    url: {json.dumps(info["url"], ensure_ascii=False)},\n'
+        f'    description: {json.dumps(info["description"], ensure_ascii=False)}\n  }}'
+        for alias, info in sites.items())
+    return (f"// Generated from inkeep_core/sites.json by github_miner/miner.py. Do not edit by hand.\n"
+            f"export interface SiteConfig {{\n  url: string;\n  description: string;\n}}\n\n"
+            f"export const DEFAULT_SITES: Record<string, SiteConfig> = {{\n{entries}\n}};\n")
+
+def render_readme(text, sites, is_zh):
+    md_lines = []
+    for alias, info in sites.items():
+        name = alias.capitalize()
+        desc = info['description']
+        if is_zh and (desc.startswith("Docs for ") or desc.startswith("Official docs for ")):
+            desc = desc.replace("Docs for ", "").replace("Official docs for ", "") + " 官方文档"
+        md_lines.append(f"*   **{name}** ({desc})")
+
+    md_content = "\n".join(md_lines)
+    pattern = r"(<!-- AUTO-GENERATED-SITES:START -->)(.*?)(<!-- AUTO-GENERATED-SITES:END -->)"
+    return re.sub(pattern, lambda m: f"{m.group(1)}\n{md_content}\n{m.group(3)}", text, flags=re.DOTALL)
+
+def flush_sites(new_sites):
+    """
+    本次运行发现的站点一次性写入 sites.json，
+    再据此重新生成 web 端 registry.ts 与两份 README 的站点列表
+    """
+    sites = load_default_sites()
+    added = 0
+    for site in new_sites:
+        if site["alias"] in sites: continue
+        sites[site["alias"]] = {"url": site["url"], "description": site["desc"]}
+        added += 1
+        print(f"🎉 Added {site['alias']} ({site['url']})", flush=True)
+    if not added: return 0
+
+    atomic_write(SITES_MANIFEST, json.dumps(sites, indent=2, ensure_ascii=False) + "\n")
+    print(f"📝 Updated {SITES_MANIFEST.name}", flush=True)
+
+    ts_file = Path("web/src/lib/inkeep/registry.ts")
+    if ts_file.exists():
+        atomic_write(ts_file, render_registry_ts(sites))
+        print(f"🌐 Updated {ts_file}", flush=True)
+
+    for readme_file in ["README.md", "README_zh.md"]:
+        if not os.path.exists(readme_file): continue
+        with open(readme_file, 'r', encoding='utf-8') as f: text = f.read()
+        atomic_write(readme_file, render_readme(text, sites, "zh" in readme_file))
+        print(f"📝 Updated {readme_file}", flush=True)
+    return added
 
 def scan_repo(repo, scanned_set):
     """单个仓库的扫描逻辑，供线程池调用"""
@@ -178,77 +259,210 @@ def scan_repo(repo, scanned_set):
     domain = urlparse(homepage).netloc
     if not domain or domain in scanned_set: return None
     
-    extractor = ConfigExtractor()
+    extractor = ConfigExtractor(script_cache=script_cache, scheduler=scheduler)
     targets = [homepage.rstrip("/"), f"{homepage.rstrip('/')}/docs", f"https://docs.{domain}"]
     targets = list(dict.fromkeys(targets))
     
-    found_url = None
+    throttled = False
     for url in targets:
-        if extractor.scan(url):
-            found_url = url
-            break
-    
-    if found_url:
-        print(f"Checking {domain} ... 🔍 FOUND CONFIG! Verifying...", flush=True)
-        if verify_site_chat(found_url):
-            print(f"   {domain} ✅ VERIFIED", flush=True)
+        try:
+            config = extractor.scan(url)
+        except HostThrottled as e:
+            # 被限流时结果未知，不能当作“未接入”
+            print(f"Checking {domain} ... ⏳ Throttled ({e})", flush=True)
+            throttled = True
+            continue
+        if config:
+            print(f"Checking {domain} ... 🔍 FOUND CONFIG! Verifying...", flush=True)
             alias = repo['name'].lower().replace('.', '-').replace('_', '-')
-            desc = (repo.get('description') or f"Docs for {repo['name']}")[:60].replace('"', '\\"').replace('\n', ' ')
-            return {"alias": alias, "url": found_url, "desc": desc, "domain": domain}
-        else:
-            print(f"   {domain} ⚠️ Verification Failed", flush=True)
-    else:
-        # 即使没找到，也记录域名已扫描
-        pass
-        
+            desc = (repo.get('description') or f"Docs for {repo['name']}")[:60].replace('\n', ' ')
+            # 待验证的候选站点，由 consume 交给验证线程池
+            return {"alias": alias, "url": url, "desc": desc, "domain": domain, "config": config}
+
+    if throttled:
+        # 留在 pending_repos 中，下次运行重试
+        return {"domain": domain, "found": False, "throttled": True}
+
+    # 即使没找到，也记录域名已扫描
     return {"domain": domain, "found": False}
 
+def compact_repo(repo):
+    """队列与 state.json 中只保留扫描需要的字段"""
+    return {"name": repo["name"], "homepage": repo.get("homepage"), "description": repo.get("description")}
+
+def produce(state, work, backlog, queued, scanned, lock, stop, produced):
+    """搜索线程：持续翻页，把待扫描仓库放入有界队列，队列满时阻塞等待扫描线程"""
+    try:
+        while not stop.is_set():
+            with lock:
+                repo = backlog[0] if backlog else None
+            if repo is None:
+                repos, next_max, next_grad = search_github(state)
+                with lock:
+                    # 到点后不再推进游标，这一页留给下次运行
+                    if stop.is_set(): return
+                    state["max_stars"] = next_max
+                    state["last_gradient"] = next_grad
+                    if not repos and state["max_stars"] < 50:
+                        state["max_stars"] = 500000
+                        return
+                    backlog.extend(compact_repo(r) for r in repos)
+                continue
+
+            homepage = repo.get("homepage")
+            domain = urlparse(homepage).netloc if homepage and homepage.startswith("http") else None
+            with lock:
+                skip = not domain or domain in scanned or domain in queued
+            if not skip:
+                try:
+                    work.put(repo, timeout=1)
+                except queue.Full:
+                    continue
+            with lock:
+                if not skip: queued.add(domain)
+                backlog.popleft()
+    finally:
+        produced.set()
+
+class Verifier:
+    """
+    验证线程池：与扫描线程分开，最多 workers 个并发验证；
+    排队的候选数有上限，满时扫描线程阻塞（背压）
+    """
+    def __init__(self, workers, on_done):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(workers * 2)
+        self.on_done = on_done
+
+    def submit(self, repo, candidate):
+        self.slots.acquire()
+        try:
+            future = self.pool.submit(verify_site, candidate)
+        except RuntimeError:
+            # 已关闭：仓库留在 active 中，下次运行重新扫描
+            self.slots.release()
+            return
+        future.add_done_callback(lambda f: self._done(f, repo, candidate))
+
+    def _done(self, future, repo, candidate):
+        try:
+            ok = future.result()
+        except Exception:
+            ok = False
+        finally:
+            self.slots.release()
+        self.on_done(repo, candidate if ok else {"domain": candidate["domain"], "found": False})
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+def record_result(repo, result, state, queued, scanned, active, deferred, discoveries, lock, stats):
+    with lock:
+        active.remove(repo)
+        queued.discard(urlparse(repo["homepage"]).netloc)
+        stats["scanned"] += 1
+        if not result: return
+        if result.get("throttled"):
+            deferred.append(repo)
+            return
+        scanned.add(result["domain"])
+        if "alias" in result:
+            # 只在内存中收集，运行结束时由 flush_sites 统一写盘（不保存 apiKey）
+            discoveries.append({k: v for k, v in result.items() if k != "config"})
+            stats["new"] += 1
+            state["found_sites"].append(result["url"])
+
+def consume(work, verifier, record, active, lock, stop, produced, scanned):
+    """扫描线程：不断从队列取仓库扫描，直到到点或搜索结束且队列清空"""
+    while not stop.is_set():
+        try:
+            repo = work.get(timeout=1)
+        except queue.Empty:
+            if produced.is_set(): return
+            continue
+        with lock:
+            active.append(repo)
+        try:
+            result = scan_repo(repo, scanned)
+        except Exception as e:
+            print(f"❌ Scan error for {repo.get('homepage')}: {e}", flush=True)
+            result = None
+        if result and "config" in result:
+            # 交给验证线程池，扫描线程继续处理下一个仓库；验证完成前仓库仍计入 active
+            verifier.submit(repo, result)
+        else:
+            record(repo, result)
+
+def checkpoint(state, backlog, work, active, deferred, discoveries, lock):
+    with lock:
+        # 尚未写入 sites.json 的发现，意外中断后下次运行补写
+        state["unflushed_sites"] = list(discoveries)
+        # 扫描中、已入队但未扫描的仓库排在积压队列前面，下次运行优先处理；被限流的排在最后
+        state["pending_repos"] = list(active) + list(work.queue) + list(backlog) + list(deferred)
+        save_state(state)
+
 def main():
     if not GITHUB_TOKEN: print("❌ GITHUB_TOKEN not set"); sys.exit(1)
     
     start_time = time.time()
     state = load_state()
-    scanned = set(state["scanned_domains"])
-    
-    print(f"🚀 Starting Miner (Max {MAX_RUNTIME_SECONDS}s, Concurrency 10)...", flush=True)
-    total_new = 0
+    scanned = ScannedDomains(SCANNED_FILE).load()
+    # 旧版 state.json 把域名列表存在 scanned_domains 中，迁移到独立的索引文件
+    legacy = state.pop("scanned_domains", None)
+    if legacy:
+        scanned.migrate(legacy)
+        save_state(state)
+        print(f"📦 Migrated {len(legacy)} scanned domains to {SCANNED_FILE}", flush=True)
+    # 上次运行遗留的待扫描仓库
+    backlog = deque(state.get("pending_repos", []))
+    queued = set()
+    active = []
+    deferred = []  # 被限流、结果未知的仓库
+    discoveries = state.pop("unflushed_sites", [])
+    work = queue.Queue(maxsize=QUEUE_SIZE)
+    lock = threading.Lock()
+    stop = threading.Event()
+    produced = threading.Event()
+    stats = {"scanned": 0, "new": 0}
     
-    while True:
-        if time.time() - start_time > MAX_RUNTIME_SECONDS:
-            print("⏰ Time limit reached.", flush=True); break
-            
-        repos, next_max, next_grad = search_github(state)
-        state["max_stars"] = next_max
-        state["last_gradient"] = next_grad
-        
-        if not repos:
-            if state["max_stars"] < 50: 
-                state["max_stars"] = 500000
-                break
-            continue
+    print(f"🚀 Starting Miner (Max {MAX_RUNTIME_SECONDS}s, Concurrency {SCAN_WORKERS}, {len(scanned)} known domains, {len(backlog)} pending)...", flush=True)
 
-        batch_new = 0
-        # 使用线程池并发扫描网站
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_repo = {executor.submit(scan_repo, repo, scanned): repo for repo in repos}
-            
-            for future in as_completed(future_to_repo):
-                result = future.result()
-                if result:
-                    scanned.add(result["domain"])
-                    if "alias" in result:
-                        update_registry_file(result)
-                        batch_new += 1
-                        total_new += 1
-                        state["found_sites"].append(result["url"])
-
-        state["scanned_domains"] = list(scanned)
+    # 搜索与扫描流水线：搜索（含限流等待）期间扫描线程持续工作
+    producer = threading.Thread(target=produce, args=(state, work, backlog, queued, scanned, lock, stop, produced), daemon=True)
+    record = lambda repo, result: record_result(repo, result, state, queued, scanned, active, deferred, discoveries, lock, stats)
+    verifier = Verifier(VERIFY_WORKERS, record)
+    consumers = [threading.Thread(target=consume, args=(work, verifier, record, active, lock, stop, produced, scanned), daemon=True)
+                 for _ in range(SCAN_WORKERS)]
+    producer.start()
+    for t in consumers: t.start()
+
+    deadline = start_time + MAX_RUNTIME_SECONDS
+    last_save = time.time()
+    while any(t.is_alive() for t in consumers):
+        time.sleep(1)
+        now = time.time()
+        if now >= deadline and not stop.is_set():
+            print("⏰ Time limit reached. Finishing in-flight scans...", flush=True)
+            stop.set()
+        if now >= deadline + STOP_GRACE_SECONDS:
+            print(f"⚠️ Leaving {len(active)} slow scans for the next run.", flush=True)
+            break
+        if now - last_save >= SAVE_INTERVAL and not stop.is_set():
+            checkpoint(state, backlog, work, active, deferred, discoveries, lock)
+            last_save = now
+            print(f"💾 Progress: {stats['scanned']} scanned, {stats['new']} new, {work.qsize()} queued", flush=True)
+
+    stop.set()
+    # 等待已排队的验证完成（数量有上限）
+    verifier.shutdown()
+    checkpoint(state, backlog, work, active, deferred, discoveries, lock)
+    scanned.compact()
+    if discoveries:
+        flush_sites(discoveries)
+        state.pop("unflushed_sites", None)
         save_state(state)
-        if batch_new > 0: update_readmes()
-        
-        if time.time() - start_time > MAX_RUNTIME_SECONDS: break
 
-    print(f"\n🏁 Finished. Total new sites: {total_new}", flush=True)
+    print(f"\n🏁 Finished. Scanned {stats['scanned']} repos ({len(deferred)} throttled, retried next run), total new sites: {stats['new']}", flush=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
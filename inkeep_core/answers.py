@@ -0,0 +1,82 @@
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+from .storage import open_store
+
+# Punctuation trimmed from the ends of each word only; '+' and '#' at the end and
+# a leading '.' carry meaning (c++, c#, .net), as does anything inside (node.js)
+_EDGE_PUNCT = re.compile(r"^[^\w.+#]+|^\.+(?=\W|$)|[^\w+#]+$")
+# Words that never change the meaning of a documentation question ("a" is
+# left out: it can be a name, as in "plan A" or "option a")
+_FILLER_WORDS = {"please", "the", "an"}
+
+def normalize_question(question):
+    """Case/punctuation/whitespace-insensitive form used as the cache key."""
+    words = (_EDGE_PUNCT.sub("", w) for w in question.casefold().split())
+    return " ".join(w for w in words if w and w not in _FILLER_WORDS)
+
+class AnswerCache:
+    """
+    Persistent cache of complete answers keyed by (domain, normalized question).
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted beyond `max_entries`.
+    """
+    def __init__(self, cache_dir=None, ttl=86400, max_entries=1000, backend=None):
+        if cache_dir:
+            self.cache_dir = Path(cache_dir)
+        else:
+            self.cache_dir = Path.home() / ".inkeep"
+
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._ensure_cache_dir()
+        self.store = open_store(self.cache_dir, "answers", backend)
+
+    def _ensure_cache_dir(self):
+        if not self.cache_dir.exists():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, url, question):
+        return f"{urlparse(url).netloc}\n{normalize_question(question)}"
+
+    def get(self, url, question):
+        key = self._key(url, question)
+        with self._lock:
+            entry = self.store.get(key)
+            if entry and time.time() - entry["created_at"] <= self.ttl:
+                # Rewriting the row refreshes its recency for LRU eviction
+                self.store.set(key, entry)
+                self.hits += 1
+                return entry["answer"]
+            if entry:
+                self.store.delete(key)
+            self.misses += 1
+            return None
+
+    def set(self, url, question, answer):
+        key = self._key(url, question)
+        with self._lock:
+            self.store.set(key, {
+                "answer": answer,
+                "created_at": time.time(),
+                "domain": urlparse(url).netloc
+            })
+            self.store.trim(self.max_entries)
+
+    def invalidate(self, url):
+        """Drops every cached answer for the URL's domain. Returns the number removed."""
+        domain = urlparse(url).netloc
+        with self._lock:
+            keys = [k for k, v in self.store.items() if v.get("domain") == domain]
+            for k in keys:
+                self.store.delete(k)
+            return len(keys)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.store)}
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+import httpx
+
+from .cache import CacheManager
+from .challenge import CHALLENGE_URL
+from .client import CHAT_URL, chat_request, site_headers
+from .async_extractor import AsyncConfigExtractor
+from .pow import PoWSolver
+from .scheduler import HostThrottled
+from .sse import ChatStreamParser
+
+logger = logging.getLogger(__name__)
+
+def create_http_client(max_connections=100):
+    """Builds an httpx.AsyncClient suitable for sharing across many AsyncInkeepClients."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(15.0, read=None),
+        follow_redirects=True,
+    )
+
+class AsyncInkeepClient:
+    """
+    asyncio counterpart of InkeepClient. Streams run on a (optionally shared)
+    httpx.AsyncClient, so one event loop can drive many concurrent questions.
+    """
+    def __init__(self, target_url, cache_dir=None, http=None):
+        self.target_url = target_url
+        self.domain = urlparse(target_url).netloc
+        self.base_url = f"https://{self.domain}"
+
+        self.headers = site_headers(target_url)
+
+        self._owns_http = http is None
+        self.http = http or create_http_client()
+        self.cache = CacheManager(cache_dir)
+        self.extractor = AsyncConfigExtractor(self.http)
+        self.config = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        """Closes the HTTP client if this instance created it."""
+        if self._owns_http:
+            await self.http.aclose()
+
+    async def initialize(self, force_refresh=False):
+        """Loads config from cache or scans the site."""
+        if not force_refresh:
+            cached = self.cache.get_config(self.target_url)
+            if cached:
+                self.config = cached['config']
+                return True
+
+        try:
+            config = await self.extractor.scan(self.target_url)
+        except HostThrottled as e:
+            logger.warning(f"{self.domain}: config scan throttled ({e})")
+            return False
+        if config:
+            self.config = config
+            self.cache.set_config(self.target_url, config)
+            return True
+
+        return False
+
+    async def ask(self, question):
+        """
+        Async generator of content chunks. Handles auto-retry on 401 Unauthorized.
+        """
+        try:
+            async for chunk in self._ask_internal(question):
+                yield chunk
+        except PermissionError:
+            self.cache.clear_config(self.target_url)
+            if await self.initialize(force_refresh=True):
+                try:
+                    async for chunk in self._ask_internal(question):
+                        yield chunk
+                except Exception as e:
+                    yield f"[Error] Retry failed: {e}"
+            else:
+                yield "[Error] Failed to refresh configuration."
+
+    async def _solve_challenge(self):
+        res = await self.http.get(CHALLENGE_URL, headers=self.headers, timeout=10)
+        if res.status_code != 200:
+            raise RuntimeError(f"Challenge failed: {res.status_code}")
+        loop = asyncio.get_running_loop()
+        try:
+            # Hashing is CPU-bound: keep it off the event loop
+            return await loop.run_in_executor(None, PoWSolver.solve, res.json())
+        except Exception as e:
+            raise RuntimeError(f"PoW failed: {e}")
+
+    async def _ask_internal(self, question):
+        if not self.config:
+            if not await self.initialize():
+                yield "[Error] Could not initialize client (Config not found)"
+                return
+
+        # 1. Challenge
+        try:
+            solution = await self._solve_challenge()
+        except Exception as e:
+            yield f"[Error] {e}"
+            return
+
+        # 2. Chat
+        chat_headers, payload = chat_request(self.config, self.headers, question, solution)
+
+        try:
+            async with self.http.stream("POST", CHAT_URL, headers=chat_headers, json=payload) as res:
+                if res.status_code == 401:
+                    # Signal caller to retry
+                    raise PermissionError("401 Unauthorized")
+
+                if res.status_code != 200:
+                    body = await res.aread()
+                    yield f"[Error] API Error {res.status_code}: {body.decode('utf-8', 'replace')}"
+                    return
+
+                parser = ChatStreamParser()
+                async for raw in res.aiter_bytes():
+                    for content in parser.feed(raw):
+                        yield content
+                    if parser.done: break
+                for content in parser.flush():
+                    yield content
+                if parser.parse_errors:
+                    logger.warning(f"{self.domain}: {parser.parse_errors} malformed stream frames skipped")
+        except PermissionError:
+            raise
+        except Exception as e:
+            yield f"[Error] Request failed: {e}"
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+import httpx
+
+from .extractor import CHUNK_SIZE, MAX_SCRIPTS, MAX_SCRIPT_BYTES, KeyMatcher, script_candidates
+from .scheduler import THROTTLE_STATUSES, HostThrottled
+
+class HostLimiter:
+    """
+    Per-host concurrency limit. Semaphores are created on demand and dropped
+    once no request for the host is in flight, so memory stays proportional
+    to the number of active hosts rather than every host ever seen.
+    """
+    def __init__(self, per_host=4):
+        self.per_host = per_host
+        self._hosts = {}  # host -> [semaphore, users]
+
+    @asynccontextmanager
+    async def acquire(self, url):
+        host = urlparse(url).netloc
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts[host] = [asyncio.Semaphore(self.per_host), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._hosts.pop(host, None)
+
+class AsyncConfigExtractor:
+    """
+    asyncio counterpart of ConfigExtractor running on a shared httpx.AsyncClient.
+    """
+    def __init__(self, http, limiter=None, max_script_bytes=MAX_SCRIPT_BYTES, script_cache=None, scheduler=None):
+        self.http = http
+        self.limiter = limiter or HostLimiter()
+        self.max_script_bytes = max_script_bytes
+        self.script_cache = script_cache
+        # Only crawlers pass a HostScheduler; interactive lookups go unpaced
+        self.scheduler = scheduler
+
+    async def _send(self, url, timeout, headers=None, stream=False):
+        """GET paced by the scheduler (if any): token bucket, 429/503 backoff and adaptive timeout."""
+        if self.scheduler is None:
+            request = self.http.build_request("GET", url, headers=headers, timeout=timeout)
+            res = await self.http.send(request, stream=stream)
+            if res.status_code in THROTTLE_STATUSES:
+                await res.aclose()
+                raise HostThrottled(f"{urlparse(url).netloc} answered {res.status_code}")
+            return res
+
+        attempt = 0
+        while True:
+            delay = self.scheduler.admit(url)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            request_timeout = self.scheduler.timeout(url, timeout)
+            request = self.http.build_request("GET", url, headers=headers, timeout=request_timeout)
+            started = time.monotonic()
+            try:
+                res = await self.http.send(request, stream=stream)
+            except httpx.TimeoutException:
+                self.scheduler.timed_out(url, request_timeout)
+                raise
+            if self.scheduler.settle(url, res.status_code, res.headers, time.monotonic() - started, attempt):
+                await res.aclose()
+                attempt += 1
+                continue
+            if res.status_code in THROTTLE_STATUSES:
+                await res.aclose()
+                raise HostThrottled(f"{urlparse(url).netloc} answered {res.status_code}")
+            return res
+
+    async def scan(self, target_url, script_tasks=None):
+        """
+        Scans the target URL for Inkeep configuration (API Key, etc.)
+        `script_tasks` (url -> Task) lets several scans of the same site share
+        downloads of the same bundle; the caller then owns cancelling them.
+        Raises HostThrottled when rate limiting left the answer unknown.
+        """
+        owns_tasks = script_tasks is None
+        if owns_tasks:
+            script_tasks = {}
+
+        try:
+            async with self.limiter.acquire(target_url):
+                res = await self._send(target_url, 15)
+            if res.status_code != 200:
+                return None
+
+            urls = script_candidates(target_url, res.text)[:MAX_SCRIPTS]
+            tasks = []
+            for js_url in urls:
+                task = script_tasks.get(js_url)
+                if task is None:
+                    task = script_tasks[js_url] = asyncio.ensure_future(self._scan_script(js_url))
+                tasks.append(task)
+
+            throttled = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # Shared downloads may have been cancelled by another scan of this site
+                    if task.cancelled():
+                        continue
+                    if isinstance(task.exception(), HostThrottled):
+                        throttled = task.exception()
+                    elif task.result():
+                        return task.result()
+            # A bundle we could not read may hold the key: the result is unknown, not a miss
+            if throttled:
+                raise throttled
+            return None
+
+        except HostThrottled:
+            raise
+        except Exception:
+            return None
+        finally:
+            if owns_tasks:
+                for task in script_tasks.values():
+                    task.cancel()
+
+    async def _scan_script(self, js_url):
+        # Bundles already scanned for another site/path cost one lookup
+        headers = {}
+        entry = self.script_cache.lookup(js_url) if self.script_cache else None
+        if entry:
+            if self.script_cache.is_fresh(entry):
+                return self.script_cache.hit(entry)
+            headers = self.script_cache.conditional_headers(entry)
+
+        try:
+            async with self.limiter.acquire(js_url):
+                js_res = await self._send(js_url, 5, headers=headers, stream=True)
+                try:
+                    if js_res.status_code == 304 and entry:
+                        return self.script_cache.revalidate(js_url, entry)
+                    if js_res.status_code != 200:
+                        return None
+                    matcher = KeyMatcher()
+                    received = 0
+                    config = None
+                    async for chunk in js_res.aiter_bytes(CHUNK_SIZE):
+                        config = matcher.feed(chunk)
+                        if config:
+                            break
+                        received += len(chunk)
+                        if received >= self.max_script_bytes:
+                            break
+                    if self.script_cache:
+                        self.script_cache.record(js_url, config, js_res.headers)
+                    return config
+                finally:
+                    await js_res.aclose()
+        except HostThrottled:
+            raise
+        except Exception:
+            return None
@@ -0,0 +1,101 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .client import ConfigNotFound
+
+# With ordered output, at most this many times `concurrency` results wait
+# behind a slow earlier record before new questions stop being submitted
+ORDERED_BUFFER_FACTOR = 4
+
+def read_questions(lines):
+    """Parses JSONL lines of {"source", "question"[, "id"]}; yields (index, record)."""
+    index = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = {"error": f"Invalid JSON: {line[:80]}"}
+        if not isinstance(record, dict):
+            record = {"error": f"Expected a JSON object: {line[:80]}"}
+        yield index, record
+        index += 1
+
+def answer_question(pool, registry, index, record):
+    """Answers one batch record on a pooled client and returns the output record."""
+    source = record.get("source")
+    question = record.get("question")
+    out = {"index": index, "source": source, "question": question, "answer": "", "error": record.get("error"),
+           "started_at": time.time(), "ttfb_ms": None, "latency_ms": None}
+    if "id" in record:
+        out["id"] = record["id"]
+
+    started = time.time()
+    try:
+        if out["error"]:
+            return out
+        if not source or not question:
+            out["error"] = "Both 'source' and 'question' are required"
+            return out
+
+        url = registry.get_url(source)
+        if not url:
+            out["error"] = f"Unknown source '{source}'"
+            return out
+
+        chunks = []
+        with pool.lease(url) as client:
+            for chunk in client.ask(question):
+                if out["ttfb_ms"] is None:
+                    out["ttfb_ms"] = int((time.time() - started) * 1000)
+                chunks.append(chunk)
+        out["answer"] = "".join(chunks)
+        if out["answer"].startswith("[Error]"):
+            out["error"] = out["answer"]
+    except ConfigNotFound:
+        out["error"] = f"Could not find Inkeep configuration for {source}"
+    except Exception as e:
+        out["error"] = str(e)
+    finally:
+        out["latency_ms"] = int((time.time() - started) * 1000)
+    return out
+
+def run_batch(pool, registry, records, concurrency=8, ordered=False):
+    """
+    Answers (index, record) pairs with at most `concurrency` in flight and
+    yields output records in completion order, or in input order if `ordered`.
+    Input is consumed lazily, so arbitrarily long question files stream through;
+    when ordered, submission pauses while too many results wait on a slow one.
+    """
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = set()
+    finished = {}  # index -> record, only used when ordered
+    next_index = 0
+    max_buffered = ORDERED_BUFFER_FACTOR * concurrency
+
+    def drain(done):
+        nonlocal next_index
+        for future in done:
+            result = future.result()
+            if not ordered:
+                yield result
+                continue
+            finished[result["index"]] = result
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+
+    try:
+        for index, record in records:
+            while len(pending) >= concurrency or (pending and len(finished) >= max_buffered):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from drain(done)
+            pending.add(executor.submit(answer_question, pool, registry, index, record))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from drain(done)
+    finally:
+        executor.shutdown(wait=False)
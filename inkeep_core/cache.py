@@ -1,54 +1,44 @@
-import json
-import os
 import time
 from pathlib import Path
 from urllib.parse import urlparse
+from .storage import open_store
 
 class CacheManager:
-    def __init__(self, cache_dir=None):
+    def __init__(self, cache_dir=None, backend=None):
         if cache_dir:
-            self.cache_path = Path(cache_dir) / "cache.json"
+            self.cache_dir = Path(cache_dir)
         else:
-            self.cache_path = Path.home() / ".inkeep" / "cache.json"
-        
+            self.cache_dir = Path.home() / ".inkeep"
+
         self._ensure_cache_dir()
-        self.cache = self._load_cache()
+        # One row per domain; an existing cache.json is migrated on first use
+        self.store = open_store(self.cache_dir, "cache", backend)
 
     def _ensure_cache_dir(self):
-        if not self.cache_path.parent.exists():
-            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
-
-    def _load_cache(self):
-        if self.cache_path.exists():
-            try:
-                with open(self.cache_path, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-        return {}
-
-    def _save_cache(self):
-        with open(self.cache_path, 'w') as f:
-            json.dump(self.cache, f, indent=2)
+        if not self.cache_dir.exists():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
 
     def get_domain(self, url):
         return urlparse(url).netloc
 
     def get_config(self, url):
         domain = self.get_domain(url)
-        return self.cache.get(domain)
+        return self.store.get(domain)
 
-    def set_config(self, url, config):
+    def set_config(self, url, config, source=None):
+        """`source` records the page/script (and their validators) the key came from."""
         domain = self.get_domain(url)
-        self.cache[domain] = {
+        self.store.set(domain, {
             "config": config,
             "updated_at": time.time(),
-            "url": url
-        }
-        self._save_cache()
+            "url": url,
+            "source": source
+        })
 
     def clear_config(self, url):
         domain = self.get_domain(url)
-        if domain in self.cache:
-            del self.cache[domain]
-            self._save_cache()
+        self.store.delete(domain)
+
+    def items(self):
+        """Returns (domain, entry) pairs for every cached site."""
+        return self.store.items()
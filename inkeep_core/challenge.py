@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs
+from . import metrics
+from .pow import PoWSolver
+
+CHALLENGE_URL = "https://api.inkeep.com/v1/challenge"
+
+# Shortest lifetime a prefetched solution is kept for when its expiry is within the margin
+MIN_LIFETIME = 1
+
+class ChallengePool:
+    """
+    Keeps a small pool of fetched and solved PoW challenge solutions so the
+    chat request can start immediately. start() fills the pool and each take()
+    refills one slot; expired solutions are dropped but not replaced, and
+    prefetching pauses once the client has been idle longer than a solution
+    lives, so idle clients do not keep solving challenges.
+    """
+    def __init__(self, session, headers, size=2, default_ttl=60, margin=5):
+        self.session = session
+        self.headers = headers
+        self.size = size
+        self.default_ttl = default_ttl
+        self.margin = margin
+        self._tokens = deque()  # (solution, expires_at)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._demand = 0  # solutions still to fetch; raised by start()/take() only
+        self._fetching = False
+        self._retry_at = 0.0
+        self._last_used = time.monotonic()
+        self._lifetime = default_ttl
+
+    def start(self):
+        with self._cond:
+            self._last_used = time.monotonic()
+            self._demand = max(self._demand, self.size - len(self._tokens))
+            self._cond.notify_all()
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="inkeep-challenge-prefetch", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            self._tokens.clear()
+            self._cond.notify_all()
+
+    def take(self, wait=0):
+        """
+        Returns a ready, unexpired solution or None if the pool is empty.
+        With `wait`, an empty pool waits up to that many seconds for a
+        prefetch already in progress instead of solving a second challenge.
+        """
+        with self._cond:
+            self._last_used = time.monotonic()
+            deadline = self._last_used + wait
+            self._purge_expired()
+            while not self._tokens and self._refilling():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+                self._purge_expired()
+            token = self._tokens.popleft()[0] if self._tokens else None
+            self._demand = min(self.size - len(self._tokens), self._demand + 1)
+            self._cond.notify_all()
+            return token
+
+    def solve_now(self):
+        """Fetches and solves a challenge on the calling thread."""
+        return self._fetch(prefetch=False)[0]
+
+    def _fetch(self, prefetch=True):
+        started = time.perf_counter()
+        res = self.session.get(CHALLENGE_URL, headers=self.headers, timeout=10)
+        metrics.emit("challenge", prefetch=prefetch, status=str(res.status_code), rtt_ms=metrics.elapsed_ms(started))
+        if res.status_code != 200:
+            raise RuntimeError(f"Challenge failed: {res.status_code}")
+        try:
+            challenge_data = res.json()
+            solution = PoWSolver.solve(challenge_data)
+        except Exception as e:
+            raise RuntimeError(f"PoW failed: {e}")
+        return solution, self._expires_at(challenge_data)
+
+    def _expires_at(self, challenge_data):
+        """
+        Altcha encodes expiry as `?expires=<unix>` in the salt; fall back to a
+        default TTL. The margin never shortens a still-valid solution below
+        MIN_LIFETIME; an already expired one is returned as is.
+        """
+        expires = challenge_data.get('expires')
+        salt = challenge_data.get('salt') or ""
+        if expires is None and "?" in salt:
+            values = parse_qs(salt.split("?", 1)[1]).get('expires')
+            if values:
+                expires = values[0]
+        now = time.time()
+        try:
+            expires = float(expires)
+        except (TypeError, ValueError):
+            expires = now + self.default_ttl
+        if expires <= now:
+            return expires
+        return max(expires - self.margin, now + MIN_LIFETIME)
+
+    def _purge_expired(self):
+        now = time.time()
+        while self._tokens and self._tokens[0][1] <= now:
+            self._tokens.popleft()
+
+    def _refilling(self):
+        # Caller holds self._cond: a fetch is running or about to start
+        if self._stopped or not (self._thread and self._thread.is_alive()):
+            return False
+        return self._fetching or (self._demand > 0 and self._retry_at <= time.monotonic())
+
+    def _wanted(self):
+        # Caller holds self._cond
+        if time.monotonic() - self._last_used > self._lifetime:
+            # Idle for longer than a solution lives: pause until the next take()/start()
+            self._demand = 0
+        return self._demand > 0 and len(self._tokens) < self.size
+
+    def _run(self):
+        backoff = 1
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    delay = self._retry_at - time.monotonic()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+                    self._purge_expired()
+                    if self._wanted():
+                        break
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                self._fetching = True
+
+            token = None
+            try:
+                token = self._fetch()
+                if token[1] <= time.time():
+                    raise RuntimeError("Challenge expired on arrival")
+                backoff = 1
+            except Exception:
+                token = None
+
+            with self._cond:
+                self._fetching = False
+                self._cond.notify_all()
+                if self._stopped:
+                    return
+                if token is None:
+                    self._retry_at = time.monotonic() + backoff
+                    backoff = min(backoff * 2, 60)
+                    continue
+                self._lifetime = max(MIN_LIFETIME, token[1] - time.time())
+                self._tokens.append(token)
+                self._demand = max(0, self._demand - 1)
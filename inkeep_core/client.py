@@ -1,48 +1,187 @@
+import logging
 import requests
+import time
 import uuid
-import json
 from urllib.parse import urlparse
+from . import metrics
 from .cache import CacheManager
+from .challenge import ChallengePool
 from .extractor import ConfigExtractor
-from .pow import PoWSolver
+from .scheduler import HostThrottled
+from .singleflight import SingleFlight
+from .sse import ChatStreamParser
+
+logger = logging.getLogger(__name__)
+
+CHAT_URL = "https://api.inkeep.com/v1/chat/completions"
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36"
+
+# Shared by all clients in the process: one scan/refresh per domain at a time
+_scans = SingleFlight()
+
+def single_flight_scan(cache, target_url, work, force_refresh=False):
+    """
+    Runs `work` (returning a source dict or None) at most once per domain
+    at a time and stores what it finds. Concurrent callers in this process
+    share the result; other processes are serialized by a lock file and
+    reuse what it stored. With `force_refresh`, only a config stored after
+    the call started counts as already done.
+    """
+    domain = urlparse(target_url).netloc
+    started = time.time()
+
+    def run():
+        # Another caller may have stored a config while we waited for the lock
+        cached = cache.get_config(target_url)
+        if cached and (not force_refresh or cached["updated_at"] >= started):
+            return dict(cached.get("source") or {}, config=cached["config"])
+
+        source = work()
+        if source:
+            cache.set_config(target_url, source["config"], source)
+        return source
+
+    lock_path = cache.cache_dir / "locks" / f"{domain}.lock"
+    return _scans.do(domain, run, lock_path)
+
+class ConfigNotFound(LookupError):
+    """Raised by ask() when no Inkeep configuration can be found on the site."""
+
+def site_headers(target_url):
+    """Browser-like headers the Inkeep API expects from a widget on `target_url`."""
+    return {
+        "origin": f"https://{urlparse(target_url).netloc}",
+        "referer": target_url,
+        "user-agent": USER_AGENT,
+    }
+
+def chat_request(config, headers, question, solution):
+    """Builds (headers, payload) for a streamed chat/completions POST."""
+    chat_headers = headers.copy()
+    
+    if 'apiKey' in config:
+        chat_headers["authorization"] = f"Bearer {config['apiKey']}"
+    elif 'integrationId' in config:
+        chat_headers["authorization"] = f"Bearer {config['integrationId']}"
+
+    chat_headers.update({
+        "accept": "application/json",
+        "content-type": "application/json",
+        "x-inkeep-challenge-solution": solution,
+        "x-stainless-helper-method": "stream"
+    })
+
+    payload = {
+        "model": "inkeep-qa-expert",
+        "messages": [{"role": "user", "content": question, "id": str(uuid.uuid4())}],
+        "stream": True
+    }
+    return chat_headers, payload
 
 class InkeepClient:
-    def __init__(self, target_url, cache_dir=None):
+    def __init__(self, target_url, cache_dir=None, answer_cache=None):
         self.target_url = target_url
         self.domain = urlparse(target_url).netloc
         self.base_url = f"https://{self.domain}"
         
         self.session = requests.Session()
-        self.headers = {
-            "origin": self.base_url,
-            "referer": self.target_url,
-            "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36",
-        }
+        self.headers = site_headers(target_url)
         
         self.cache = CacheManager(cache_dir)
         self.extractor = ConfigExtractor(self.session)
+        self.challenges = ChallengePool(self.session, self.headers)
+        self.answer_cache = answer_cache
         self.config = None
 
     def initialize(self, force_refresh=False):
         """Loads config from cache or scans the site."""
+        # Start solving PoW challenges in the background while the config loads
+        self.challenges.start()
+
+        started = time.perf_counter()
         if not force_refresh:
             cached = self.cache.get_config(self.target_url)
             if cached:
                 self.config = cached['config']
+                metrics.emit("config", domain=self.domain, cache="hit", duration_ms=metrics.elapsed_ms(started))
                 return True
         
         # Cache miss or forced refresh: scan
-        config = self.extractor.scan(self.target_url)
-        if config:
-            self.config = config
-            self.cache.set_config(self.target_url, config)
+        source = self._scan(lambda: self.extractor.locate(self.target_url), force_refresh)
+        metrics.emit("config", domain=self.domain, cache="refresh" if force_refresh else "miss",
+                     found=bool(source), scan_ms=metrics.elapsed_ms(started))
+        if source:
+            self.config = source["config"]
             return True
         
         return False
 
+    def refresh(self, rejected=None):
+        """
+        Re-checks the page/script that produced the cached key with conditional
+        requests and only falls back to a full scan if it changed or no longer
+        yields a usable key. `rejected` is a config the API just refused.
+        """
+        source = self._scan(lambda: self._revalidate_or_scan(rejected), True)
+        if source:
+            self.config = source["config"]
+            return True
+        return False
+
+    def _revalidate_or_scan(self, rejected):
+        cached = self.cache.get_config(self.target_url)
+        source = cached.get("source") if cached else None
+        if source:
+            fresh = self.extractor.revalidate(source, rejected)
+            if fresh:
+                return fresh
+
+        # A throttled scan raises here and leaves the cached config in place
+        fresh = self.extractor.locate(self.target_url)
+        if not fresh:
+            self.cache.clear_config(self.target_url)
+        return fresh
+
+    def _scan(self, work, force_refresh):
+        try:
+            return single_flight_scan(self.cache, self.target_url, work, force_refresh)
+        except HostThrottled as e:
+            logger.warning(f"{self.domain}: config scan throttled ({e})")
+            return None
+
+    def close(self):
+        """Stops the challenge prefetcher and releases the HTTP connection pool."""
+        self.challenges.close()
+        self.session.close()
+
     def ask(self, question, stream=True):
         """
-        Executes the query. Handles auto-retry on 401 Unauthorized.
+        Executes the query. Serves repeat questions from the answer cache when
+        one is configured; otherwise streams from Inkeep and caches the result.
+        The client initializes itself on the first cache miss, so a cache hit
+        costs nothing upstream; raises ConfigNotFound if that fails.
+        """
+        if self.answer_cache:
+            cached = self.answer_cache.get(self.target_url, question)
+            if cached is not None:
+                yield cached
+                return
+
+        if not self.config and not self.initialize():
+            raise ConfigNotFound(f"Could not find Inkeep configuration for {self.target_url}")
+
+        chunks = []
+        for chunk in self._ask_with_retry(question):
+            chunks.append(chunk)
+            yield chunk
+
+        # Only complete, error-free answers are cached
+        if self.answer_cache and chunks and not any(c.startswith("[Error]") for c in chunks):
+            self.answer_cache.set(self.target_url, question, "".join(chunks))
+
+    def _ask_with_retry(self, question):
+        """
+        Handles auto-retry on 401 Unauthorized.
         """
         # First attempt
         try:
@@ -52,9 +191,8 @@ class InkeepClient:
             # 401 detected in _ask_internal
             # yield "[System] Session expired. Refreshing keys..." # Optional: inform user
             
-            # Clear cache and force re-initialization
-            self.cache.clear_config(self.target_url)
-            if self.initialize(force_refresh=True):
+            # Revalidate the key's source, rescanning the site only if needed
+            if self.refresh(rejected=self.config):
                 try:
                     # Retry once
                     for chunk in self._ask_internal(question):
@@ -65,51 +203,42 @@ class InkeepClient:
                 yield "[Error] Failed to refresh configuration."
 
     def _ask_internal(self, question):
+        """Runs one question and reports its per-phase timings as a "question" event."""
+        span = {"domain": self.domain, "status": None}
+        started = time.perf_counter()
+        try:
+            yield from self._ask_stream(question, span)
+        finally:
+            span["total_ms"] = metrics.elapsed_ms(started)
+            metrics.emit("question", **span)
+
+    def _ask_stream(self, question, span):
         if not self.config:
             if not self.initialize():
                 yield "[Error] Could not initialize client (Config not found)"
                 return
 
-        # 1. Challenge
-        try:
-            challenge_res = self.session.get(
-                "https://api.inkeep.com/v1/challenge",
-                headers=self.headers,
-                timeout=10
-            )
-            if challenge_res.status_code != 200:
-                yield f"[Error] Challenge failed: {challenge_res.status_code}"
+        # 1. Challenge (pre-solved by the prefetcher when available)
+        solution = self.challenges.take(wait=15)
+        span["challenge"] = "prefetched"
+        if not solution:
+            span["challenge"] = "inline"
+            challenge_started = time.perf_counter()
+            try:
+                solution = self.challenges.solve_now()
+            except Exception as e:
+                yield f"[Error] {e}"
                 return
-            
-            solution = PoWSolver.solve(challenge_res.json())
-        except Exception as e:
-            yield f"[Error] PoW failed: {e}"
-            return
+            finally:
+                span["challenge_ms"] = metrics.elapsed_ms(challenge_started)
 
         # 2. Chat
-        url = "https://api.inkeep.com/v1/chat/completions"
-        chat_headers = self.headers.copy()
-        
-        if 'apiKey' in self.config:
-            chat_headers["authorization"] = f"Bearer {self.config['apiKey']}"
-        elif 'integrationId' in self.config:
-             chat_headers["authorization"] = f"Bearer {self.config['integrationId']}"
-
-        chat_headers.update({
-            "accept": "application/json",
-            "content-type": "application/json",
-            "x-inkeep-challenge-solution": solution,
-            "x-stainless-helper-method": "stream"
-        })
-
-        payload = {
-            "model": "inkeep-qa-expert",
-            "messages": [{"role": "user", "content": question, "id": str(uuid.uuid4())}],
-            "stream": True
-        }
+        chat_headers, payload = chat_request(self.config, self.headers, question, solution)
 
         try:
-            res = self.session.post(url, headers=chat_headers, json=payload, stream=True)
+            post_started = time.perf_counter()
+            res = self.session.post(CHAT_URL, headers=chat_headers, json=payload, stream=True)
+            span["status"] = res.status_code
             
             if res.status_code == 401:
                 # Signal caller to retry
@@ -119,18 +248,27 @@ class InkeepClient:
                 yield f"[Error] API Error {res.status_code}: {res.text}"
                 return
 
-            for line in res.iter_lines():
-                if line:
-                    decoded = line.decode('utf-8')
-                    if decoded.startswith("data: "):
-                        data_str = decoded[6:].strip()
-                        if data_str == "[DONE]": break
-                        try:
-                            data = json.loads(data_str)
-                            if "choices" in data:
-                                content = data["choices"][0]["delta"].get("content", "")
-                                if content: yield content
-                        except: continue
+            # chunk_size=None yields data as it arrives instead of in tiny fixed reads
+            parser = ChatStreamParser()
+            chunks = chars = 0
+            try:
+                for raw in res.iter_content(chunk_size=None):
+                    for content in parser.feed(raw):
+                        if not chunks:
+                            span["ttfb_ms"] = metrics.elapsed_ms(post_started)
+                        chunks += 1
+                        chars += len(content)
+                        yield content
+                    if parser.done: break
+                for content in parser.flush():
+                    chunks += 1
+                    chars += len(content)
+                    yield content
+            finally:
+                res.close()
+                span.update(parser.stats(), chunks=chunks, chars=chars, stream_ms=metrics.elapsed_ms(post_started))
+                if parser.parse_errors:
+                    logger.warning(f"{self.domain}: {parser.parse_errors} malformed stream frames skipped")
         except PermissionError:
             raise
         except Exception as e:
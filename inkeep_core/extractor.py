@@ -1,66 +1,292 @@
+import codecs
 import re
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urljoin, urlparse
+from .scheduler import THROTTLE_STATUSES, HostThrottled
+
+# Limit to first 50 scripts to avoid taking too long
+MAX_SCRIPTS = 50
+# Stop downloading a bundle after this many bytes
+MAX_SCRIPT_BYTES = 5 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Characters carried over between chunks so keys split across a boundary still match
+OVERLAP = 512
+
+# Single pass over each bundle; only apiKey is used, the other ids are recorded
+KEY_PATTERN = re.compile(
+    r'apiKey\s*:\s*["\'](?P<apiKey>[a-f0-9]{32,})["\']'
+    r'|integrationId\s*:\s*["\'](?P<integrationId>[a-zA-Z0-9_-]{20,})["\']'
+    r'|organizationId\s*:\s*["\'](?P<organizationId>[a-zA-Z0-9_-]{20,})["\']'
+)
+
+class KeyMatcher:
+    """
+    Incremental matcher for a JS bundle fed as raw byte chunks.
+    feed() returns the config as soon as an apiKey is seen.
+    """
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self._tail = ""
+        self.found = {}
+
+    def feed(self, chunk):
+        text = self._tail + self._decoder.decode(chunk)
+        for match in KEY_PATTERN.finditer(text):
+            key_name = match.lastgroup
+            self.found.setdefault(key_name, match.group(key_name))
+            if key_name == 'apiKey': # Primary target
+                return {"apiKey": match.group(key_name)}
+        self._tail = text[-OVERLAP:]
+        return None
+
+def script_candidates(target_url, html):
+    """Returns script URLs found in the page, most likely key holders first."""
+    # 1. Identify Script Candidates
+    # Matches src="/path/to/script.js" or src='...'
+    # Use triple quotes to avoid escaping issues
+    script_pattern = r'src=["\']([^"\']+\.js[^"\']*)["\']'
+    scripts = re.findall(script_pattern, html)
+
+    base_url = f"{urlparse(target_url).scheme}://{urlparse(target_url).netloc}"
+
+    candidates = []
+    others = []
+
+    # Prioritize likely candidates
+    for s in scripts:
+        full_s = urljoin(base_url, s)
+        s_lower = s.lower()
+        if 'inkeep' in s_lower:
+            candidates.insert(0, full_s)
+        elif any(x in s_lower for x in ['layout', 'app', '_app', 'page', 'main']):
+            candidates.append(full_s)
+        else:
+            others.append(full_s)
+
+    return list(dict.fromkeys(candidates + others))
 
 class ConfigExtractor:
-    def __init__(self, session=None):
+    def __init__(self, session=None, max_workers=8, max_script_bytes=MAX_SCRIPT_BYTES, script_cache=None, scheduler=None):
         self.session = session or requests.Session()
+        self.max_workers = max_workers
+        self.max_script_bytes = max_script_bytes
+        self.script_cache = script_cache
+        # Crawlers pass one HostScheduler shared by extractors hitting the same
+        # hosts; interactive lookups go unpaced so cold starts stay fast
+        self.scheduler = scheduler
+
+    def _get(self, url, timeout, cancel=None, **kwargs):
+        """
+        GET through the scheduler when there is one. Returns None without
+        sending if `cancel` is set by the time the request may go out.
+        """
+        if self.scheduler:
+            return self.scheduler.get(self.session, url, timeout, cancel=cancel, **kwargs)
+        res = self.session.get(url, timeout=timeout, **kwargs)
+        if res.status_code in THROTTLE_STATUSES:
+            res.close()
+            raise HostThrottled(f"{urlparse(url).netloc} answered {res.status_code}")
+        return res
 
     def scan(self, target_url):
         """
         Scans the target URL for Inkeep configuration (API Key, etc.)
+        Raises HostThrottled when the answer is unknown because the host
+        rate limited us, so callers can retry later instead of recording a miss.
+        """
+        source = self.locate(target_url)
+        return source["config"] if source else None
+
+    def locate(self, target_url):
+        """
+        Like scan(), but also returns where the key came from so it can be
+        revalidated later: {"config", "page_url", "page_etag",
+        "page_last_modified", "script_url", "etag", "last_modified"}.
         """
         try:
-            res = self.session.get(target_url, timeout=15)
+            res = self._get(target_url, 15)
             if res.status_code != 200:
                 return None
-            
-            # 1. Identify Script Candidates
-            # Matches src="/path/to/script.js" or src='...'
-            # Use triple quotes to avoid escaping issues
-            script_pattern = r'src=["\']([^"\']+\.js[^"\']*)["\']'
-            scripts = re.findall(script_pattern, res.text)
-            
-            base_url = f"{urlparse(target_url).scheme}://{urlparse(target_url).netloc}"
-            
-            candidates = []
-            others = []
-            
-            # Prioritize likely candidates
-            for s in scripts:
-                full_s = urljoin(base_url, s)
-                s_lower = s.lower()
-                if 'inkeep' in s_lower:
-                    candidates.insert(0, full_s)
-                elif any(x in s_lower for x in ['layout', 'app', '_app', 'page', 'main']):
-                    candidates.append(full_s)
+
+            final_list = script_candidates(target_url, res.text)
+            source = self._scan_scripts(final_list[:MAX_SCRIPTS])
+            if source:
+                source.update(_page_validators(target_url, res.headers))
+            return source
+
+        except HostThrottled:
+            raise
+        except Exception as e:
+            return None
+
+    def revalidate(self, source, rejected=None):
+        """
+        Re-checks the page and script that produced a cached key with
+        conditional requests. Returns an updated source, or None when the
+        caller should fall back to a full scan: the page no longer references
+        the script, the script lost its key, or the key is still the
+        `rejected` one the API refused.
+        """
+        try:
+            page_headers = _conditional_headers(source.get("page_etag"), source.get("page_last_modified"))
+            page_res = self._get(source["page_url"], 15, headers=page_headers)
+            if page_res.status_code == 200:
+                if source["script_url"] not in script_candidates(source["page_url"], page_res.text)[:MAX_SCRIPTS]:
+                    return None
+                page = _page_validators(source["page_url"], page_res.headers)
+            elif page_res.status_code == 304:
+                page = {k: source.get(k) for k in ("page_url", "page_etag", "page_last_modified")}
+            else:
+                return None
+
+            script_headers = _conditional_headers(source.get("etag"), source.get("last_modified"))
+            js_res = self._get(source["script_url"], 5, stream=True, headers=script_headers)
+            try:
+                if js_res.status_code == 304:
+                    fresh = {k: source.get(k) for k in ("config", "script_url", "etag", "last_modified")}
+                elif js_res.status_code == 200:
+                    config, _ = self._read_key(js_res)
+                    if not config:
+                        return None
+                    fresh = _script_source(config, source["script_url"], js_res.headers)
                 else:
-                    others.append(full_s)
-            
-            final_list = list(dict.fromkeys(candidates + others))
-            
-            # 2. Scan Scripts
-            patterns = [
-                (r'apiKey\s*:\s*["\']([a-f0-9]{32,})["\']', "apiKey"),
-                (r'integrationId\s*:\s*["\']([a-zA-Z0-9_-]{20,})["\']', "integrationId"),
-                (r'organizationId\s*:\s*["\']([a-zA-Z0-9_-]{20,})["\']', "organizationId")
-            ]
-            
-            # Limit to first 50 scripts to avoid taking too long
-            for js_url in final_list[:50]:
+                    return None
+            finally:
+                js_res.close()
+
+            if rejected and fresh["config"] == rejected:
+                return None
+            fresh.update(page)
+            return fresh
+
+        except HostThrottled:
+            raise
+        except Exception:
+            return None
+
+    def _scan_scripts(self, urls):
+        """
+        2. Scan Scripts
+        Downloads run concurrently; the executor picks them up in priority
+        order and the first bundle containing a key cancels the rest.
+        """
+        if not urls:
+            return None
+
+        cancel = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls)))
+        futures = [executor.submit(self._scan_and_cancel, js_url, cancel) for js_url in urls]
+        throttled = None
+        try:
+            for future in as_completed(futures):
                 try:
-                    js_res = self.session.get(js_url, timeout=5)
-                    if js_res.status_code == 200:
-                        for p, key_name in patterns:
-                            match = re.search(p, js_res.text)
-                            if match:
-                                val = match.group(1)
-                                if key_name == 'apiKey': # Primary target
-                                    return {"apiKey": val}
-                except Exception:
+                    source = future.result()
+                except HostThrottled as e:
+                    throttled = e
                     continue
-            
+                if source:
+                    return source
+            # A bundle we could not read may hold the key: the result is unknown, not a miss
+            if throttled:
+                raise throttled
             return None
+        finally:
+            cancel.set()
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
 
-        except Exception as e:
-            return None
\ No newline at end of file
+    def _scan_and_cancel(self, js_url, cancel):
+        # Cancel from the worker itself so idle workers stop picking up bundles
+        source = self._scan_script(js_url, cancel)
+        if source:
+            cancel.set()
+        return source
+
+    def _scan_script(self, js_url, cancel):
+        if cancel.is_set():
+            return None
+
+        # Bundles already scanned for another site/path cost one lookup
+        headers = {}
+        entry = self.script_cache.lookup(js_url) if self.script_cache else None
+        if entry:
+            if self.script_cache.is_fresh(entry):
+                return _cached_source(js_url, entry, self.script_cache.hit(entry))
+            headers = self.script_cache.conditional_headers(entry)
+
+        try:
+            js_res = self._get(js_url, 5, cancel, stream=True, headers=headers)
+        except HostThrottled:
+            raise
+        except Exception:
+            return None
+        if js_res is None:
+            return None
+
+        try:
+            if js_res.status_code == 304 and entry:
+                return _cached_source(js_url, entry, self.script_cache.revalidate(js_url, entry))
+            if js_res.status_code != 200:
+                return None
+            config, complete = self._read_key(js_res, cancel)
+            if self.script_cache and complete:
+                self.script_cache.record(js_url, config, js_res.headers)
+            return _script_source(config, js_url, js_res.headers) if config else None
+        except Exception:
+            return None
+        finally:
+            js_res.close()
+
+    def _read_key(self, js_res, cancel=None):
+        """
+        Streams the body so the download stops at the first hit or the size cap.
+        Returns (config, complete); complete is False if cancelled midway.
+        """
+        matcher = KeyMatcher()
+        received = 0
+        for chunk in js_res.iter_content(chunk_size=CHUNK_SIZE):
+            if cancel and cancel.is_set():
+                return None, False
+            config = matcher.feed(chunk)
+            if config:
+                return config, True
+            received += len(chunk)
+            if received >= self.max_script_bytes:
+                break
+        return None, True
+
+def _conditional_headers(etag, last_modified):
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+def _page_validators(page_url, headers):
+    return {
+        "page_url": page_url,
+        "page_etag": headers.get("etag"),
+        "page_last_modified": headers.get("last-modified")
+    }
+
+def _script_source(config, script_url, headers):
+    return {
+        "config": config,
+        "script_url": script_url,
+        "etag": headers.get("etag"),
+        "last_modified": headers.get("last-modified")
+    }
+
+def _cached_source(script_url, entry, config):
+    if not config:
+        return None
+    return {
+        "config": config,
+        "script_url": script_url,
+        "etag": entry.get("etag"),
+        "last_modified": entry.get("last_modified")
+    }
@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from .client import ConfigNotFound
+
+# Extra time allowed for a stream to notice the deadline before it is abandoned
+GRACE_SECONDS = 5
+# Most sources one question may fan out to
+MAX_SOURCES = 20
+
+def ask_many(pool, registry, sources, question, timeout=60, max_workers=8):
+    """
+    Asks one question against several documentation sources concurrently.
+    Each source resolves through `registry.get_url` and is answered by a
+    pooled InkeepClient, at most `max_workers` at a time. Yields one result
+    per source as soon as it finishes:
+    {"source", "url", "answer", "latency_ms", "timed_out", "error"}.
+    A source still streaming at `timeout` seconds returns its partial answer.
+    Raises ValueError for more than MAX_SOURCES distinct sources.
+    """
+    deadline = time.time() + timeout
+
+    def run(source):
+        started = time.time()
+        result = {"source": source, "url": None, "answer": "", "latency_ms": 0, "timed_out": False, "error": None}
+        try:
+            url = registry.get_url(source)
+            if not url:
+                result["error"] = f"Unknown source '{source}'"
+                return result
+            result["url"] = url
+
+            chunks = []
+            with pool.lease(url) as client:
+                for chunk in client.ask(question):
+                    chunks.append(chunk)
+                    if time.time() > deadline:
+                        result["timed_out"] = True
+                        break
+            result["answer"] = "".join(chunks)
+        except ConfigNotFound:
+            result["error"] = f"Could not find Inkeep configuration for {source}"
+        except Exception as e:
+            result["error"] = str(e)
+        finally:
+            result["latency_ms"] = int((time.time() - started) * 1000)
+        return result
+
+    sources = list(dict.fromkeys(sources))
+    if not sources:
+        return
+    if len(sources) > MAX_SOURCES:
+        raise ValueError(f"At most {MAX_SOURCES} sources can be asked at once (got {len(sources)})")
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources))))
+    futures = {executor.submit(run, source): source for source in sources}
+    try:
+        for future in as_completed(futures, timeout=timeout + GRACE_SECONDS):
+            yield future.result()
+    except TimeoutError:
+        # Streams blocked on the network never reached the deadline check
+        for future, source in futures.items():
+            if not future.done():
+                yield {"source": source, "url": registry.get_url(source), "answer": "",
+                       "latency_ms": int((timeout + GRACE_SECONDS) * 1000), "timed_out": True, "error": None}
+    finally:
+        # Sources still queued behind the worker limit never start
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
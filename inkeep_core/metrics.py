@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+class LogSink:
+    """Writes each event as one JSON log line."""
+    def emit(self, event):
+        logger.info(json.dumps(event))
+
+class JSONLSink:
+    """Appends each event to a JSONL file."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event) + "\n"
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+
+class PrometheusSink:
+    """
+    Counts events as `inkeep_<event>_total`, aggregates numeric fields into
+    `inkeep_<event>_<field>` summaries (`_sum`, and `_count` of the events
+    carrying the field) and counts string fields per value in one family
+    per field (`inkeep_<event>_by_<field>_total{<field>="<value>"}`), so no
+    family counts the same events twice. Served as Prometheus text.
+    Numeric fields in LABEL_FIELDS are identifiers, not quantities, and are
+    counted per value like strings.
+    """
+    LABEL_FIELDS = ("status", "maxnumber")
+
+    def __init__(self):
+        self._sums = {}
+        self._field_counts = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        name = event.get("event", "event")
+        with self._lock:
+            self._counts[(name, None, None)] = self._counts.get((name, None, None), 0) + 1
+            for field, value in event.items():
+                if field in ("event", "ts") or isinstance(value, bool):
+                    continue
+                if field in self.LABEL_FIELDS and isinstance(value, (int, float)):
+                    value = str(value)
+                if isinstance(value, (int, float)):
+                    self._sums[(name, field)] = self._sums.get((name, field), 0) + value
+                    self._field_counts[(name, field)] = self._field_counts.get((name, field), 0) + 1
+                elif isinstance(value, str) and field not in ("domain", "url"):
+                    key = (name, field, value)
+                    self._counts[key] = self._counts.get(key, 0) + 1
+
+    def render(self):
+        counters = {}
+        with self._lock:
+            for (name, field, value), count in self._counts.items():
+                if field is None:
+                    counters.setdefault(f"inkeep_{name}_total", []).append(("", count))
+                else:
+                    label = f'{{{field}="{_escape_label(value)}"}}'
+                    counters.setdefault(f"inkeep_{name}_by_{field}_total", []).append((label, count))
+            summaries = {
+                f"inkeep_{name}_{field}": (total, self._field_counts[(name, field)])
+                for (name, field), total in self._sums.items()
+            }
+
+        lines = []
+        for family in sorted(counters):
+            lines.append(f"# TYPE {family} counter")
+            for label, count in sorted(counters[family]):
+                lines.append(f"{family}{label} {count}")
+        for family in sorted(summaries):
+            total, count = summaries[family]
+            lines.append(f"# TYPE {family} summary")
+            lines.append(f"{family}_sum {total}")
+            lines.append(f"{family}_count {count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Exposes render() at http://host:port/metrics on a daemon thread."""
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = sink.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="inkeep-metrics", daemon=True).start()
+        return server
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+_sink = None
+
+def set_sink(sink):
+    global _sink
+    _sink = sink
+
+def enabled():
+    return _sink is not None
+
+def emit(event, **fields):
+    """Sends one timing/counter event to the configured sink (no-op without one)."""
+    if _sink is None:
+        return
+    try:
+        _sink.emit(dict(fields, event=event, ts=time.time()))
+    except Exception as e:
+        logger.debug(f"Metrics sink failed: {e}")
+
+def configure_from_env():
+    """
+    INKEEP_METRICS selects the sink: "log", "jsonl:<path>" or "prometheus:<port>".
+    """
+    spec = os.environ.get("INKEEP_METRICS", "")
+    if not spec:
+        return None
+    kind, _, arg = spec.partition(":")
+    if kind == "log":
+        sink = LogSink()
+    elif kind == "jsonl":
+        sink = JSONLSink(arg or "inkeep_metrics.jsonl")
+    elif kind == "prometheus":
+        sink = PrometheusSink()
+        sink.serve(int(arg or 9464))
+    else:
+        raise ValueError(f"Unknown INKEEP_METRICS sink: {spec}")
+    set_sink(sink)
+    return sink
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
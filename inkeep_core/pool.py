@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from .client import InkeepClient
+
+class ClientPool:
+    """
+    Process-wide pool of warm InkeepClient instances keyed by domain.
+    Each client keeps its requests.Session (connection pool / TLS), loaded
+    cache and config, so repeat questions to the same site skip setup cost.
+    Idle clients are closed by a background sweep, so a quiet process does
+    not keep their sessions and prefetch threads alive. Clients checked out
+    with lease() are never closed mid-stream: evicting one only retires it,
+    and it is closed when the last lease is released.
+    """
+    def __init__(self, max_size=32, idle_timeout=600, cache_dir=None, answer_cache=None):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.cache_dir = cache_dir
+        self.answer_cache = answer_cache
+        self._clients = OrderedDict()  # domain -> (client, last_used)
+        self._in_use = {}  # client -> active leases
+        self._retired = set()  # evicted clients waiting for their leases to end
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stopped = threading.Event()
+
+    def get(self, target_url):
+        """
+        Returns a pooled client for the URL's domain, creating it on a miss.
+        The client may be evicted and closed at any time; use lease() to
+        keep it open while streaming.
+        """
+        return self._checkout(target_url, lease=False)
+
+    @contextmanager
+    def lease(self, target_url):
+        """get(), but the client is not closed by eviction until the block exits."""
+        client = self._checkout(target_url, lease=True)
+        try:
+            yield client
+        finally:
+            self._release(client)
+
+    def _checkout(self, target_url, lease):
+        domain = urlparse(target_url).netloc
+        now = time.time()
+
+        with self._lock:
+            self._evict_idle(now)
+            self._start_sweeper()
+            entry = self._clients.get(domain)
+            if entry:
+                client = entry[0]
+                self._clients[domain] = (client, now)
+                self._clients.move_to_end(domain)
+            else:
+                client = InkeepClient(target_url, cache_dir=self.cache_dir, answer_cache=self.answer_cache)
+                self._clients[domain] = (client, now)
+            if lease:
+                self._in_use[client] = self._in_use.get(client, 0) + 1
+            while len(self._clients) > self.max_size:
+                _, (old, _) = self._clients.popitem(last=False)
+                self._retire(old)
+            return client
+
+    def _release(self, client):
+        with self._lock:
+            self._in_use[client] -= 1
+            if self._in_use[client]:
+                return
+            del self._in_use[client]
+            if client in self._retired:
+                self._retired.discard(client)
+                client.close()
+                return
+            # Idle time counts from the end of the last question
+            for domain, (pooled, _) in self._clients.items():
+                if pooled is client:
+                    self._clients[domain] = (client, time.time())
+                    break
+
+    def _retire(self, client):
+        # Caller holds self._lock; clients with active leases close on release
+        if self._in_use.get(client):
+            self._retired.add(client)
+        else:
+            client.close()
+
+    def discard(self, target_url):
+        """Drops the client for a domain (e.g. after its cache was cleaned)."""
+        domain = urlparse(target_url).netloc
+        with self._lock:
+            entry = self._clients.pop(domain, None)
+            if entry:
+                self._retire(entry[0])
+
+    def update_config(self, target_url, config):
+        """Swaps a refreshed config into the pooled client for that domain, if any."""
+        domain = urlparse(target_url).netloc
+        with self._lock:
+            entry = self._clients.get(domain)
+        if entry:
+            entry[0].config = config
+
+    def clear(self):
+        """Closes every pooled client and stops the idle sweep."""
+        self._stopped.set()
+        with self._lock:
+            clients = [c for c, _ in self._clients.values()]
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    def _start_sweeper(self):
+        # Caller holds self._lock
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        self._stopped.clear()
+        self._sweeper = threading.Thread(target=self._sweep, name="inkeep-pool-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _sweep(self):
+        interval = max(1, min(60, self.idle_timeout / 2))
+        while not self._stopped.wait(interval):
+            with self._lock:
+                self._evict_idle(time.time())
+
+    def _evict_idle(self, now):
+        # A client streaming a long answer is busy, not idle
+        expired = [d for d, (client, used) in self._clients.items()
+                   if now - used > self.idle_timeout and not self._in_use.get(client)]
+        for domain in expired:
+            client, _ = self._clients.pop(domain)
+            self._retire(client)
+
+    def __len__(self):
+        return len(self._clients)
@@ -1,13 +1,84 @@
 import hashlib
 import json
 import base64
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from . import metrics
+
+# Challenges with a larger search space are split across a process pool
+PARALLEL_THRESHOLD = 1000000
+CHUNK_SIZE = 200000
+
+_executor = None
+_executor_workers = os.cpu_count() or 2
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # The pool is first created from worker/prefetch threads; forking a
+            # multithreaded process can deadlock the children, so never fork.
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _executor = ProcessPoolExecutor(max_workers=_executor_workers,
+                                            mp_context=multiprocessing.get_context(method))
+        return _executor
+
+def _search_range(salt, target, start, stop):
+    """
+    Scans numbers in [start, stop). The salt is hashed once and the
+    pre-seeded state is copied per candidate; digests are compared as raw bytes.
+    """
+    seeded = hashlib.sha256(salt.encode())
+    copy = seeded.copy
+    for i in range(start, stop):
+        h = copy()
+        h.update(b"%d" % i)
+        if h.digest() == target:
+            return i
+    return None
+
+def _search_parallel(salt, target, max_number):
+    executor = _get_executor()
+    workers = _executor_workers
+    ranges = iter(
+        (start, min(start + CHUNK_SIZE, max_number + 1))
+        for start in range(0, max_number + 1, CHUNK_SIZE)
+    )
+
+    # Keep a bounded window of chunks in flight so a hit cancels the rest early
+    pending = set()
+    try:
+        for _ in range(workers * 2):
+            r = next(ranges, None)
+            if r is None: break
+            pending.add(executor.submit(_search_range, salt, target, *r))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                number = future.result()
+                if number is not None:
+                    return number
+            for _ in done:
+                r = next(ranges, None)
+                if r is None: break
+                pending.add(executor.submit(_search_range, salt, target, *r))
+        return None
+    finally:
+        for future in pending:
+            future.cancel()
 
 class PoWSolver:
     @staticmethod
-    def solve(challenge_data):
+    def solve(challenge_data, parallel_threshold=PARALLEL_THRESHOLD):
         """
         Solves the Inkeep Altcha PoW challenge.
         Algorithm: SHA-256(salt + str(number)) == challenge
+        Small challenges are solved in-process; large ones use a process pool.
         """
         challenge = challenge_data.get('challenge')
         salt = challenge_data.get('salt')
@@ -17,17 +88,38 @@ class PoWSolver:
         if not challenge or not salt or not signature:
             raise ValueError("Invalid challenge data")
 
-        for i in range(max_number + 1):
-            h = hashlib.sha256((salt + str(i)).encode()).hexdigest()
-            if h == challenge:
-                solution = {
-                    "number": i,
-                    "algorithm": "SHA-256",
-                    "challenge": challenge,
-                    "maxnumber": max_number,
-                    "salt": salt,
-                    "signature": signature
-                }
-                return base64.b64encode(json.dumps(solution).encode()).decode()
-        
-        raise Exception(f"Failed to solve PoW challenge within max_number={max_number}")
+        try:
+            target = bytes.fromhex(challenge)
+        except ValueError:
+            raise ValueError("Invalid challenge data")
+
+        started = time.perf_counter()
+        number = None
+        engine = "sequential"
+        if max_number >= parallel_threshold and (os.cpu_count() or 1) > 1:
+            engine = "parallel"
+            try:
+                number = _search_parallel(salt, target, max_number)
+            except (OSError, RuntimeError):
+                # Process pool unavailable (e.g. restricted sandbox): fall back to in-process
+                engine = "sequential"
+                number = _search_range(salt, target, 0, max_number + 1)
+        else:
+            number = _search_range(salt, target, 0, max_number + 1)
+
+        metrics.emit("pow", engine=engine, maxnumber=max_number, found=number is not None,
+                     iterations=(number if number is not None else max_number) + 1,
+                     duration_ms=metrics.elapsed_ms(started))
+
+        if number is None:
+            raise Exception(f"Failed to solve PoW challenge within max_number={max_number}")
+
+        solution = {
+            "number": number,
+            "algorithm": "SHA-256",
+            "challenge": challenge,
+            "maxnumber": max_number,
+            "salt": salt,
+            "signature": signature
+        }
+        return base64.b64encode(json.dumps(solution).encode()).decode()
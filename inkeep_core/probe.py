@@ -0,0 +1,55 @@
+import time
+import requests
+from urllib.parse import urlparse
+from . import metrics
+from .challenge import ChallengePool
+from .client import CHAT_URL, chat_request, site_headers
+from .sse import SSEDecoder
+
+# Shortest prompt that still goes through the authenticated chat path
+PROBE_QUESTION = "hi"
+
+def probe_config(target_url, config, session=None, timeout=15):
+    """
+    Checks that an already extracted config is accepted by the Inkeep API
+    without scanning the site again or waiting for a full answer: one
+    challenge, one chat request, and the stream is closed at the first SSE
+    frame. Returns (ok, reason).
+    """
+    own_session = session is None
+    session = session or requests.Session()
+    headers = site_headers(target_url)
+    started = time.perf_counter()
+    status = None
+    try:
+        try:
+            solution = ChallengePool(session, headers).solve_now()
+        except Exception as e:
+            return _result(target_url, started, status, False, str(e))
+
+        chat_headers, payload = chat_request(config, headers, PROBE_QUESTION, solution)
+        res = session.post(CHAT_URL, headers=chat_headers, json=payload, stream=True, timeout=timeout)
+        status = res.status_code
+        try:
+            if status != 200:
+                return _result(target_url, started, status, False, f"API Error {status}")
+            decoder = SSEDecoder()
+            for raw in res.iter_content(chunk_size=None):
+                for data in decoder.feed(raw):
+                    # An error object in place of a completion chunk means the key is unusable
+                    if '"error"' in data and '"choices"' not in data:
+                        return _result(target_url, started, status, False, data[:200])
+                    return _result(target_url, started, status, True, "ok")
+            return _result(target_url, started, status, False, "Empty stream")
+        finally:
+            res.close()
+    except Exception as e:
+        return _result(target_url, started, status, False, f"Request failed: {e}")
+    finally:
+        if own_session:
+            session.close()
+
+def _result(target_url, started, status, ok, reason):
+    metrics.emit("probe", domain=urlparse(target_url).netloc, status=str(status), ok=ok,
+                 duration_ms=metrics.elapsed_ms(started))
+    return ok, reason
@@ -0,0 +1,106 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from .cache import CacheManager
+from .client import single_flight_scan
+from .extractor import ConfigExtractor
+from .scheduler import HostThrottled
+
+logger = logging.getLogger(__name__)
+
+class ConfigRefresher:
+    """
+    Proactively re-validates cached site configs older than `max_age` seconds
+    so that key rotations are picked up in the background instead of on a
+    user's request. Work is spread out with random jitter and capped at
+    `concurrency` sites at a time. `on_update(url, config)` is called after a
+    new config has been stored (e.g. to swap it into pooled clients).
+    """
+    def __init__(self, cache=None, max_age=43200, concurrency=4, jitter=30, on_update=None):
+        self.cache = cache or CacheManager()
+        self.max_age = max_age
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.on_update = on_update
+        self.extractor = ConfigExtractor(requests.Session())
+        self._stop = threading.Event()
+        self._thread = None
+
+    def stale_entries(self):
+        now = time.time()
+        return [
+            (domain, entry) for domain, entry in self.cache.items()
+            if now - entry.get("updated_at", 0) > self.max_age
+        ]
+
+    def refresh_entry(self, domain, entry):
+        """Returns "revalidated", "rescanned" or "failed"."""
+        if self._stop.wait(random.uniform(0, self.jitter)):
+            return "failed"
+
+        url = entry["url"]
+        source = entry.get("source")
+        # A config stored by a concurrent refresh (e.g. after a 401) counts as revalidated
+        outcome = "revalidated"
+
+        def work():
+            nonlocal outcome
+            fresh = self.extractor.revalidate(source) if source else None
+            if not fresh:
+                fresh = self.extractor.locate(url)
+                outcome = "rescanned"
+            return fresh
+
+        try:
+            # Same per-domain single flight and lock file as InkeepClient's scans and 401 refreshes
+            fresh = single_flight_scan(self.cache, url, work, force_refresh=True)
+        except HostThrottled as e:
+            # Unknown rather than gone: keep the old config and retry on a later pass
+            logger.warning(f"Refresh throttled for {domain}: {e}")
+            return "failed"
+
+        if not fresh:
+            # Keep the old config: it may still work and a user request will self-heal on 401
+            logger.warning(f"Refresh failed for {domain}")
+            return "failed"
+
+        # Stored by single_flight_scan as a single row write
+        if self.on_update and fresh["config"] != entry.get("config"):
+            self.on_update(url, fresh["config"])
+        return outcome
+
+    def run_once(self):
+        """Refreshes every stale entry. Returns a count per outcome."""
+        stale = self.stale_entries()
+        counts = {"revalidated": 0, "rescanned": 0, "failed": 0}
+        if not stale:
+            return counts
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for outcome in executor.map(lambda item: self.refresh_entry(*item), stale):
+                counts[outcome] += 1
+        logger.info(f"Config refresh: {counts}")
+        return counts
+
+    def start(self, interval=1800):
+        """Runs run_once() every `interval` seconds on a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="inkeep-config-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval):
+        delay = random.uniform(0, self.jitter)
+        while not self._stop.wait(delay):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Config refresh error: {e}")
+            delay = interval + random.uniform(0, self.jitter)
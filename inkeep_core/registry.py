@@ -2,121 +2,15 @@ import json
 import os
 from pathlib import Path
 
-# 默认支持的黄金站点列表
-DEFAULT_SITES = {
-    "langfuse": {
-        "url": "https://langfuse.com",
-        "description": "Langfuse (LLM Engineering Platform) official documentation"
-    },
-    "render": {
-        "url": "https://render.com/docs",
-        "description": "Render (Cloud Hosting) official documentation"
-    },
-    "clerk": {
-        "url": "https://clerk.com/docs",
-        "description": "Clerk (Authentication) official documentation"
-    },
-    "neon": {
-        "url": "https://neon.com/docs",
-        "description": "Neon (Serverless Postgres) official documentation"
-    },
-    "teleport": {
-        "url": "https://goteleport.com/docs",
-        "description": "Teleport (Access Plane) official documentation"
-    },
-    "react": {
-        "url": "https://react.dev",
-        "description": "The library for web and native user interfaces."
-    },
-    "bootstrap": {
-        "url": "https://getbootstrap.com",
-        "description": "The most popular HTML, CSS, and JavaScript framework for dev"
-    },
-    "ragflow": {
-        "url": "https://ragflow.io",
-        "description": "RAGFlow is a leading open-source Retrieval-Augmented Generat"
-    },
-    "node": {
-        "url": "https://base.org",
-        "description": "Everything required to run your own Base node"
-    },
-    "socket-io": {
-        "url": "https://socket.io",
-        "description": "Realtime application framework (Node.JS server)"
-    },
-    "sway": {
-        "url": "https://docs.fuel.network/docs/sway",
-        "description": "🌴 Empowering everyone to build reliable and efficient smart "
-    },
-    "bun": {
-        "url": "https://bun.com",
-        "description": "Incredibly fast JavaScript runtime, bundler, test runner, and package manager."
-    },
-    "zod": {
-        "url": "https://zod.dev",
-        "description": "TypeScript-first schema validation with static type inference."
-    },
-    "novu": {
-        "url": "https://docs.novu.co",
-        "description": "The open-source notification Inbox infrastructure. E-mail, SMS, and Push."
-    },
-    "litellm": {
-        "url": "https://docs.litellm.ai/docs",
-        "description": "Python SDK, Proxy Server (AI Gateway) to call 100+ LLM APIs."
-    },
-    "posthog": {
-        "url": "https://posthog.com",
-        "description": "🦔 PostHog is an all-in-one developer platform for building products."
-    },
-    "goose": {
-        "url": "https://block.github.io/goose",
-        "description": "An open source, extensible AI agent that goes beyond code suggestions."
-    },
-    "frigate": {
-        "url": "https://docs.frigate.video",
-        "description": "NVR with realtime local object detection for IP cameras."
-    },
-    "fingerprintjs": {
-        "url": "https://docs.fingerprint.com",
-        "description": "The most advanced free and open-source browser fingerprinting."
-    },
-    "spacetimedb": {
-        "url": "https://spacetimedb.com/docs",
-        "description": "Multiplayer at the speed of light."
-    },
-    "nextra": {
-        "url": "https://nextra.site",
-        "description": "Simple, powerful and flexible site generation framework with Next.js."
-    },
-    "zitadel": {
-        "url": "https://zitadel.com",
-        "description": "ZITADEL - Identity infrastructure, simplified for you."
-    },
-    "opal": {
-        "url": "https://docs.opal.ac",
-        "description": "Policy and data administration, distribution, and real-time "
-    },
-    "javascript": {
-        "url": "https://clerk.com",
-        "description": "Official JavaScript repository for Clerk authentication"
-    },
-    "vectordbbench": {
-        "url": "https://zilliz.com/vector-database-benchmark-tool",
-        "description": "Benchmark for vector databases."
-    },
-    "eon": {
-        "url": "https://www.pubnub.com/developers/eon",
-        "description": "An open-source chart and map framework for realtime data."
-    },
-    "kit": {
-        "url": "https://www.solanakit.com",
-        "description": "Solana JavaScript SDK"
-    },
-    "lemonsqueezy-js": {
-        "url": "https://docs.lemonsqueezy.com/api",
-        "description": "Official JavaScript SDK for Lemon Squeezy."
-    }
-} # END_DEFAULT_SITES
+# 默认支持的黄金站点列表：sites.json 是唯一数据源，
+# web/src/lib/inkeep/registry.ts 与 README 站点列表均由 miner 据此生成
+SITES_MANIFEST = Path(__file__).with_name("sites.json")
+
+def load_default_sites(path=SITES_MANIFEST):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+DEFAULT_SITES = load_default_sites()
 
 class SiteRegistry:
     def __init__(self, config_dir=None):
@@ -127,6 +21,21 @@ class SiteRegistry:
         
         self._ensure_dir()
         self.sites = self._load_registry()
+        self._mtime = self._registry_mtime()
+
+    def _registry_mtime(self):
+        try:
+            return self.registry_path.stat().st_mtime
+        except OSError:
+            return None
+
+    def refresh(self):
+        """Reloads the registry only if the file changed on disk (e.g. via `cli.py add`)."""
+        mtime = self._registry_mtime()
+        if mtime != self._mtime:
+            self.sites = self._load_registry()
+            self._mtime = self._registry_mtime()
+        return self.sites
 
     def _ensure_dir(self):
         if not self.registry_path.parent.exists():
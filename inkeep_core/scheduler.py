@@ -0,0 +1,193 @@
+import random
+import threading
+import time
+import requests
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Responses that mean "slow down" rather than "not here"
+THROTTLE_STATUSES = (429, 503)
+
+class HostThrottled(Exception):
+    """Raised instead of sleeping when a host is paused for longer than max_wait."""
+
+class _Host:
+    def __init__(self, burst, per_host):
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttles = 0
+        self.srtt = None
+        self.rttvar = 0.0
+        self.in_flight = 0
+        self.slots = threading.BoundedSemaphore(per_host)
+
+class HostScheduler:
+    """
+    Per-host politeness for crawls that touch many sites at once.
+    Each host gets a token bucket (`rate` requests/s, bursts of `burst`) and
+    at most `per_host` requests in flight; 429/503 pause the host for the
+    Retry-After delay or an exponential backoff, and timeouts follow the
+    host's observed latency (smoothed like TCP's RTO) instead of a constant.
+    Hosts are independent, so throughput across many hosts stays high.
+    """
+    def __init__(self, rate=5.0, burst=8, per_host=4, min_timeout=2.0, max_timeout=30.0,
+                 max_retries=2, max_wait=30.0, max_backoff=300.0, max_hosts=10000):
+        self.rate = rate
+        self.burst = burst
+        self.per_host = per_host
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.max_backoff = max_backoff
+        self.max_hosts = max_hosts
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        # Caller holds self._lock
+        host = urlparse(url).netloc
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _Host(self.burst, self.per_host)
+            self._evict()
+        else:
+            self._hosts.move_to_end(host)
+        return state
+
+    def _evict(self):
+        # Forget the least recently used hosts that are idle and not backing off
+        now = time.monotonic()
+        for host in list(self._hosts):
+            if len(self._hosts) <= self.max_hosts:
+                break
+            state = self._hosts[host]
+            if state.in_flight == 0 and state.blocked_until <= now:
+                del self._hosts[host]
+
+    def reserve(self, url):
+        """Takes one token for the host; returns how long to wait before sending."""
+        with self._lock:
+            state = self._host(url)
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * self.rate)
+            state.updated = now
+            state.tokens -= 1
+            delay = -state.tokens / self.rate if state.tokens < 0 else 0.0
+            return max(delay, state.blocked_until - now)
+
+    def timeout(self, url, default):
+        """`default` until the host has been measured, then srtt + 4 * rttvar."""
+        with self._lock:
+            state = self._host(url)
+            if state.srtt is None:
+                return default
+            return min(self.max_timeout, max(self.min_timeout, state.srtt + 4 * state.rttvar))
+
+    def observe(self, url, latency):
+        """Records a response time and clears the host's throttle streak."""
+        with self._lock:
+            state = self._host(url)
+            if state.srtt is None:
+                state.srtt, state.rttvar = latency, latency / 2
+            else:
+                state.rttvar = 0.75 * state.rttvar + 0.25 * abs(state.srtt - latency)
+                state.srtt = 0.875 * state.srtt + 0.125 * latency
+            state.throttles = 0
+
+    def timed_out(self, url, timeout):
+        """A timeout counts as a sample of `timeout` seconds, so the next one is longer."""
+        with self._lock:
+            state = self._host(url)
+            state.srtt = max(state.srtt or 0.0, timeout)
+            state.rttvar = max(state.rttvar, timeout / 2)
+
+    def throttled(self, url, headers=None):
+        """Pauses the host after a 429/503 and returns the pause in seconds."""
+        with self._lock:
+            state = self._host(url)
+            state.throttles += 1
+            # The server's Retry-After wins; otherwise back off exponentially with jitter
+            delay = _retry_after(headers)
+            if delay is None:
+                delay = (2 ** state.throttles) * (1 + random.random())
+            delay = min(self.max_backoff, delay)
+            state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+            return delay
+
+    def admit(self, url):
+        """reserve(), raising HostThrottled instead of a wait longer than max_wait."""
+        delay = self.reserve(url)
+        if delay > self.max_wait:
+            raise HostThrottled(f"{urlparse(url).netloc} is paused for {delay:.0f}s")
+        return delay
+
+    def settle(self, url, status, headers, latency, attempt):
+        """
+        Records a response; returns True if it was throttled and the caller
+        should close it and retry (attempt is the number of retries so far).
+        A throttled response that is not retried should become HostThrottled.
+        """
+        if status not in THROTTLE_STATUSES:
+            self.observe(url, latency)
+            return False
+        pause = self.throttled(url, headers)
+        return attempt < self.max_retries and pause <= self.max_wait
+
+    def get(self, session, url, timeout, cancel=None, **kwargs):
+        """
+        session.get() under the host's limits. Throttled requests are retried
+        while the pause is at most `max_wait`; otherwise the throttled
+        response is closed and HostThrottled raised, as it is when the host
+        is paused for longer than `max_wait`: the caller learns nothing about
+        the URL and should retry later rather than treat it as a miss. For
+        streamed responses the in-flight slot is released once headers arrive.
+        Returns None without sending if the `cancel` event is set once the
+        request has waited for its slot and token.
+        """
+        attempt = 0
+        while True:
+            with self._lock:
+                state = self._host(url)
+                state.in_flight += 1
+            try:
+                with state.slots:
+                    delay = self.admit(url)
+                    if delay > 0:
+                        time.sleep(delay)
+                    if cancel is not None and cancel.is_set():
+                        return None
+                    request_timeout = self.timeout(url, timeout)
+                    started = time.monotonic()
+                    try:
+                        res = session.get(url, timeout=request_timeout, **kwargs)
+                    except requests.Timeout:
+                        self.timed_out(url, request_timeout)
+                        raise
+            finally:
+                with self._lock:
+                    state.in_flight -= 1
+
+            if self.settle(url, res.status_code, res.headers, time.monotonic() - started, attempt):
+                res.close()
+                attempt += 1
+                continue
+            if res.status_code in THROTTLE_STATUSES:
+                res.close()
+                raise HostThrottled(f"{urlparse(url).netloc} answered {res.status_code}")
+            return res
+
+def _retry_after(headers):
+    value = (headers or {}).get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
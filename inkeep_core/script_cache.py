@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from .storage import open_store
+
+class ScriptCache:
+    """
+    Scan verdicts for script bundles keyed by absolute URL, shared across sites.
+    Each entry stores the config found in the bundle (or None) together with
+    its ETag/Last-Modified. Fresh entries are answered without any request;
+    stale ones are revalidated with a conditional GET.
+    Memory is bounded by `max_entries` (LRU); pass `cache_dir` to also
+    persist verdicts in `<cache_dir>/scripts.db`.
+    """
+    def __init__(self, max_entries=10000, ttl=3600, cache_dir=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = None
+        if cache_dir:
+            Path(cache_dir).mkdir(parents=True, exist_ok=True)
+            self.store = open_store(cache_dir, "scripts")
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def lookup(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry:
+                self._entries.move_to_end(url)
+                return entry
+        if self.store is not None:
+            entry = self.store.get(url)
+            if entry:
+                self._remember(url, entry)
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry["checked_at"] <= self.ttl
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def hit(self, entry):
+        """Counts a fresh hit and returns the cached verdict."""
+        self.hits += 1
+        return entry["config"]
+
+    def revalidate(self, url, entry):
+        """Marks an entry as confirmed by a 304 and returns its verdict."""
+        entry = dict(entry, checked_at=time.time())
+        self.revalidated += 1
+        self._save(url, entry)
+        return entry["config"]
+
+    def record(self, url, config, headers):
+        """Stores the verdict of a completed scan of `url`."""
+        self.misses += 1
+        self._save(url, {
+            "config": config,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "checked_at": time.time()
+        })
+
+    def _save(self, url, entry):
+        self._remember(url, entry)
+        if self.store is not None:
+            self.store.set(url, entry)
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self.store.trim(self.max_entries * 10)
+
+    def _remember(self, url, entry):
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,90 @@
+import json
+
+class SSEDecoder:
+    """
+    Incremental text/event-stream decoder. Accepts raw byte chunks of any size
+    (frames may be split across chunk boundaries) and returns the `data`
+    payload of each completed event. Multi-line `data:` fields are joined with
+    newlines as per the SSE spec.
+    """
+    def __init__(self):
+        self._buffer = b""
+        self._data = []
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        if b"\n" not in chunk:
+            return []
+
+        lines = self._buffer.split(b"\n")
+        self._buffer = lines.pop()
+
+        events = []
+        for line in lines:
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            if not line:
+                # Blank line terminates the event
+                if self._data:
+                    events.append(b"\n".join(self._data).decode('utf-8', 'replace'))
+                    self._data = []
+            elif line.startswith(b"data:"):
+                value = line[5:]
+                if value.startswith(b" "):
+                    value = value[1:]
+                self._data.append(value)
+            # Comments (":...") and other fields (event/id/retry) are ignored
+        return events
+
+    def flush(self):
+        """Returns the trailing event if the stream ended without a blank line."""
+        events = self.feed(b"\n") if self._buffer else []
+        if self._data:
+            events += self.feed(b"\n")
+        return events
+
+class ChatStreamParser:
+    """
+    Extracts `choices[0].delta.content` strings from an Inkeep chat/completions
+    SSE body. Frames that cannot carry content (role headers, finish markers)
+    are skipped without JSON parsing; malformed frames are counted.
+    """
+    def __init__(self):
+        self.decoder = SSEDecoder()
+        self.frames = 0
+        self.skipped = 0
+        self.parse_errors = 0
+        self.done = False
+
+    def feed(self, chunk):
+        return self._contents(self.decoder.feed(chunk))
+
+    def flush(self):
+        return self._contents(self.decoder.flush())
+
+    def _contents(self, events):
+        contents = []
+        for data in events:
+            if self.done:
+                break
+            self.frames += 1
+            content = self._content(data)
+            if content:
+                contents.append(content)
+        return contents
+
+    def _content(self, data):
+        if data.startswith("[DONE]"):
+            self.done = True
+            return None
+        if '"content"' not in data:
+            self.skipped += 1
+            return None
+        try:
+            return json.loads(data)["choices"][0]["delta"].get("content")
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            self.parse_errors += 1
+            return None
+
+    def stats(self):
+        return {"frames": self.frames, "skipped": self.skipped, "parse_errors": self.parse_errors}
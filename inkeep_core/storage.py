@@ -0,0 +1,154 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# Backend used by CacheManager / AnswerCache when none is given: "sqlite" or "json"
+DEFAULT_BACKEND = os.environ.get("INKEEP_CACHE_BACKEND", "sqlite")
+
+class SQLiteStore:
+    """
+    Key/value store backed by one SQLite table in WAL mode. Every get/set is a
+    single indexed row operation and writes are atomic, so several processes
+    (CLI, MCP server, scanner threads) can share the same file safely.
+    """
+    def __init__(self, path, table="entries"):
+        self.path = Path(path)
+        self.table = table
+        self._local = threading.local()
+        self._conn().execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn().execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_updated_at ON {self.table} (updated_at)"
+        )
+
+    def _conn(self):
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        self._conn().execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, updated_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time())
+        )
+
+    def delete(self, key):
+        cur = self._conn().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        return cur.rowcount > 0
+
+    def items(self):
+        rows = self._conn().execute(f"SELECT key, value FROM {self.table}").fetchall()
+        return [(k, json.loads(v)) for k, v in rows]
+
+    def trim(self, max_entries):
+        """Deletes the least recently written rows beyond max_entries."""
+        self._conn().execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (max_entries,)
+        )
+
+    def __len__(self):
+        return self._conn().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+class JSONStore:
+    """
+    Key/value store kept in memory and persisted to a single JSON file.
+    Writes go to a temp file that is renamed into place, so the file is never
+    left truncated; concurrent writers still follow last-writer-wins.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.data = self._load()
+
+    def _load(self):
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    return OrderedDict(json.load(f))
+            except (json.JSONDecodeError, TypeError, ValueError):
+                return OrderedDict()
+        return OrderedDict()
+
+    def _save(self):
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            self._save()
+
+    def delete(self, key):
+        with self._lock:
+            if key not in self.data:
+                return False
+            del self.data[key]
+            self._save()
+            return True
+
+    def items(self):
+        return list(self.data.items())
+
+    def trim(self, max_entries):
+        with self._lock:
+            if len(self.data) <= max_entries:
+                return
+            while len(self.data) > max_entries:
+                self.data.popitem(last=False)
+            self._save()
+
+    def __len__(self):
+        return len(self.data)
+
+def open_store(directory, name, backend=None):
+    """
+    Opens `<directory>/<name>.db` (SQLite) or `<directory>/<name>.json`.
+    A legacy JSON file next to a new SQLite store is imported once and renamed.
+    """
+    backend = backend or DEFAULT_BACKEND
+    directory = Path(directory)
+    json_path = directory / f"{name}.json"
+
+    if backend == "json":
+        return JSONStore(json_path)
+    if backend != "sqlite":
+        raise ValueError(f"Unknown cache backend: {backend}")
+
+    store = SQLiteStore(directory / f"{name}.db", table=name)
+    if json_path.exists():
+        _migrate_json(json_path, store)
+    return store
+
+def _migrate_json(json_path, store):
+    legacy = JSONStore(json_path)
+    for key, value in legacy.items():
+        if store.get(key) is None:
+            store.set(key, value)
+    try:
+        os.replace(json_path, json_path.with_name(f"{json_path.name}.migrated"))
+    except OSError:
+        # Another process migrated it first
+        pass
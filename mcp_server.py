@@ -1,7 +1,16 @@
+import os
 import sys
 import json
+import time
 import logging
-from inkeep_core.client import InkeepClient
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from inkeep_core import metrics
+from inkeep_core.answers import AnswerCache
+from inkeep_core.client import ConfigNotFound
+from inkeep_core.fanout import MAX_SOURCES, ask_many
+from inkeep_core.pool import ClientPool
+from inkeep_core.refresher import ConfigRefresher
 from inkeep_core.registry import SiteRegistry
 
 # Configure logging
@@ -10,9 +19,82 @@ logger = logging.getLogger("mcp-server")
 
 registry = SiteRegistry()
 
+# 同时执行的 tools/call 数量上限，可通过环境变量调整
+MAX_CONCURRENCY = int(os.environ.get("INKEEP_MCP_CONCURRENCY", "8"))
+
+# 支持的 MCP 协议版本（新到旧）；notifications/progress 的 message 字段自 2025-03-26 起才有定义
+PROTOCOL_VERSIONS = ["2025-06-18", "2025-03-26", "2024-11-05"]
+PROGRESS_MESSAGE_SINCE = "2025-03-26"
+# initialize 时与客户端协商出的版本
+protocol_version = PROTOCOL_VERSIONS[-1]
+
+# 所有响应都经由同一把锁写入 stdout，避免并发写入时 JSON 行交错
+_write_lock = threading.Lock()
+
+# 答案缓存：相同站点的相同问题直接返回，INKEEP_ANSWER_TTL=0 时关闭
+ANSWER_TTL = int(os.environ.get("INKEEP_ANSWER_TTL", "86400"))
+answer_cache = AnswerCache(
+    ttl=ANSWER_TTL,
+    max_entries=int(os.environ.get("INKEEP_ANSWER_CACHE_SIZE", "1000")),
+) if ANSWER_TTL > 0 else None
+
+# 常驻的客户端池：按域名复用 Session / 连接池 / 已加载的配置
+client_pool = ClientPool(
+    max_size=int(os.environ.get("INKEEP_MCP_POOL_SIZE", "32")),
+    idle_timeout=int(os.environ.get("INKEEP_MCP_POOL_IDLE", "600")),
+    answer_cache=answer_cache,
+)
+
+# 后台定期复查过期的站点配置，避免用户请求时才触发 401 重新扫描；INKEEP_REFRESH_INTERVAL=0 时关闭
+REFRESH_INTERVAL = int(os.environ.get("INKEEP_REFRESH_INTERVAL", "1800"))
+refresher = ConfigRefresher(
+    max_age=int(os.environ.get("INKEEP_REFRESH_MAX_AGE", "43200")),
+    on_update=client_pool.update_config,
+)
+
+def write_message(message):
+    with _write_lock:
+        sys.stdout.write(json.dumps(message) + "\n")
+        sys.stdout.flush()
+
+class ProgressStream:
+    """
+    将回答的增量内容以 MCP notifications/progress 推送给客户端（需请求携带
+    _meta.progressToken），按 interval 合并发送，避免每个 token 一条消息。
+    协商的协议早于 2025-03-26 时没有 message 字段，只推送进度（已输出字符数）。
+    """
+    def __init__(self, token, interval=0.1):
+        self.token = token
+        self.interval = interval
+        self.progress = 0
+        self._pending = []
+        self._last_sent = 0
+
+    def send(self, text):
+        if self.token is None:
+            return
+        self._pending.append(text)
+        self.progress += len(text)
+        if time.time() - self._last_sent >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.token is None or not self._pending:
+            return
+        params = {"progressToken": self.token, "progress": self.progress}
+        if protocol_version >= PROGRESS_MESSAGE_SINCE:
+            params["message"] = "".join(self._pending)
+        write_message({
+            "jsonrpc": "2.0",
+            "method": "notifications/progress",
+            "params": params
+        })
+        self._pending = []
+        self._last_sent = time.time()
+
 def handle_list_tools(id):
     # 1. 动态获取当前注册的所有站点
-    sites = registry.list_sites()
+    sites = registry.refresh()
     aliases = list(sites.keys())
     
     # 2. 构建智能描述 Prompt
@@ -54,6 +136,34 @@ def handle_list_tools(id):
                         },
                         "required": ["source", "question"]
                     }
+                },
+                {
+                    "name": "ask_multiple_sources",
+                    "description": (
+                        "Ask the same question against several documentation sources at once "
+                        "(e.g. to compare products). Sources are queried concurrently; results "
+                        f"are returned per source with latency. Configured sources: {supported_list_str}."
+                    ),
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "sources": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "maxItems": MAX_SOURCES,
+                                "description": "Documentation source aliases or full URLs."
+                            },
+                            "question": {
+                                "type": "string",
+                                "description": "The specific technical question to ask."
+                            },
+                            "timeout": {
+                                "type": "number",
+                                "description": "Per-source timeout in seconds (default 60)."
+                            }
+                        },
+                        "required": ["sources", "question"]
+                    }
                 }
             ]
         }
@@ -65,8 +175,7 @@ def handle_call_tool(id, params):
 
     # Tool: list_documentation_sources
     if name == "list_documentation_sources":
-        current_registry = SiteRegistry() 
-        sites = current_registry.list_sites()
+        sites = registry.refresh()
         
         site_list = [
             {"id": alias, "description": info["description"], "url": info["url"]}
@@ -85,14 +194,14 @@ def handle_call_tool(id, params):
         source = args.get("source")
         question = args.get("question")
         
-        current_registry = SiteRegistry()
-        target_url = current_registry.get_url(source)
+        registry.refresh()
+        target_url = registry.get_url(source)
         
         if not target_url:
             if source.startswith("http"):
                 target_url = source
             else:
-                available = ", ".join(current_registry.list_sites().keys())
+                available = ", ".join(registry.list_sites().keys())
                 return {
                     "jsonrpc": "2.0",
                     "id": id,
@@ -104,25 +213,33 @@ def handle_call_tool(id, params):
 
         logger.info(f"Asking {source} ({target_url}): {question}")
         
-        client = InkeepClient(target_url)
-        response_text = ""
+        chunks = []
+        progress = ProgressStream((params.get("_meta") or {}).get("progressToken"))
         
         try:
-            if not client.initialize():
-                return {
-                    "jsonrpc": "2.0",
-                    "id": id,
-                    "result": {
-                        "content": [{"type": "text", "text": f"Error: Could not find Inkeep configuration for {source}."}]
-                    }
-                }
+            # ask() 先查答案缓存，未命中时才加载配置/扫描站点并预取 PoW；
+            # lease 期间客户端即使被淘汰也不会在流式输出中途被关闭
+            with client_pool.lease(target_url) as client:
+                for chunk in client.ask(question):
+                    chunks.append(chunk)
+                    progress.send(chunk)
+            progress.flush()
+            response_text = "".join(chunks)
 
-            for chunk in client.ask(question):
-                response_text += chunk
-                
+        except ConfigNotFound:
+            return {
+                "jsonrpc": "2.0",
+                "id": id,
+                "result": {
+                    "content": [{"type": "text", "text": f"Error: Could not find Inkeep configuration for {source}."}]
+                }
+            }
         except Exception as e:
             response_text = f"Error: {str(e)}"
 
+        if answer_cache:
+            logger.info(f"Answer cache: {answer_cache.stats()}")
+
         return {
             "jsonrpc": "2.0",
             "id": id,
@@ -131,6 +248,50 @@ def handle_call_tool(id, params):
             }
         }
     
+    # Tool: ask_multiple_sources
+    if name == "ask_multiple_sources":
+        sources = args.get("sources") or []
+        question = args.get("question")
+        timeout = float(args.get("timeout") or 60)
+
+        if not isinstance(sources, list) or not all(isinstance(s, str) for s in sources):
+            return {
+                "jsonrpc": "2.0",
+                "id": id,
+                "error": {"code": -32602, "message": "'sources' must be an array of strings"}
+            }
+        sources = list(dict.fromkeys(sources))
+        if len(sources) > MAX_SOURCES:
+            return {
+                "jsonrpc": "2.0",
+                "id": id,
+                "error": {"code": -32602, "message": f"At most {MAX_SOURCES} sources can be asked at once"}
+            }
+
+        registry.refresh()
+        logger.info(f"Asking {len(sources)} sources ({', '.join(sources)}): {question}")
+        progress = ProgressStream((params.get("_meta") or {}).get("progressToken"), interval=0)
+
+        # 按完成顺序输出，每个来源附带耗时
+        sections = []
+        # 扇出宽度同样受 INKEEP_MCP_CONCURRENCY 限制
+        for result in ask_many(client_pool, registry, sources, question, timeout=timeout, max_workers=MAX_CONCURRENCY):
+            status = f"{result['latency_ms']} ms"
+            if result["timed_out"]:
+                status += ", timed out"
+            body = f"Error: {result['error']}" if result["error"] else result["answer"]
+            section = f"## {result['source']} ({status})\n\n{body}"
+            sections.append(section)
+            progress.send(section + "\n\n")
+
+        return {
+            "jsonrpc": "2.0",
+            "id": id,
+            "result": {
+                "content": [{"type": "text", "text": "\n\n".join(sections)}]
+            }
+        }
+
     return {
         "jsonrpc": "2.0",
         "id": id,
@@ -140,60 +301,98 @@ def handle_call_tool(id, params):
         }
     }
 
+def negotiate_protocol(params):
+    """使用客户端请求的版本（若支持），否则回复我们支持的最新版本，由客户端决定是否断开"""
+    global protocol_version
+    requested = (params or {}).get("protocolVersion")
+    protocol_version = requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0]
+    return protocol_version
+
+def handle_request(request):
+    """Handles the cheap, non-tool methods inline. Returns None for notifications."""
+    method = request.get("method")
+    req_id = request.get("id")
+
+    if method == "tools/list":
+        return handle_list_tools(req_id)
+    if method == "initialize":
+        return {
+            "jsonrpc": "2.0",
+            "id": req_id,
+            "result": {
+                "protocolVersion": negotiate_protocol(request.get("params")),
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": "inkeep-mcp", "version": "2.1.0"}
+            }
+        }
+    if method == "ping":
+        return {"jsonrpc": "2.0", "id": req_id, "result": {}}
+    return None
+
+def run_tool_call(req_id, params):
+    """Worker entry: runs one tools/call and writes its response as soon as it completes."""
+    try:
+        response = handle_call_tool(req_id, params or {})
+    except Exception as e:
+        logger.error(f"Tool call {req_id} failed: {e}")
+        response = {
+            "jsonrpc": "2.0",
+            "id": req_id,
+            "error": {"code": -32603, "message": f"Internal error: {e}"}
+        }
+    write_message(response)
+
 def main():
     # 简单的参数处理：如果用户输入 --help，提示这不是 CLI 工具
     if len(sys.argv) > 1 and sys.argv[1] in ["--help", "-h"]:
         print("Inkeep MCP Server")
         print("Usage: This script is intended to be run by an MCP client (e.g. Claude Desktop, Gemini CLI) via stdio.")
+        print("Set INKEEP_MCP_CONCURRENCY to limit concurrent tool calls (default: 8).")
+        print("Set INKEEP_METRICS to log:, jsonl:<path> or prometheus:<port> to record per-phase timings.")
         print("To use the human-friendly CLI, run: python3 cli.py --help")
         sys.exit(0)
 
-    logger.info("Inkeep MCP Server Started")
-    
-    while True:
-        try:
-            line = sys.stdin.readline()
-            if not line:
-                break
-            
-            request = json.loads(line)
-            method = request.get("method")
-            req_id = request.get("id")
-            
-            response = None
-            
-            if method == "tools/list":
-                response = handle_list_tools(req_id)
-            elif method == "tools/call":
-                response = handle_call_tool(req_id, request.get("params"))
-            elif method == "initialize":
-                 response = {
-                     "jsonrpc": "2.0",
-                     "id": req_id,
-                     "result": {
-                         "protocolVersion": "2024-11-05",
-                         "capabilities": {"tools": {}},
-                         "serverInfo": {"name": "inkeep-mcp", "version": "2.1.0"}
-                     }
-                 }
-            elif method == "notifications/initialized":
-                continue
-            elif method == "ping":
-                 response = {"jsonrpc": "2.0", "id": req_id, "result": {}}
-            
-            if response:
-                sys.stdout.write(json.dumps(response) + "\n")
-                sys.stdout.flush()
-
-        except KeyboardInterrupt:
-            # 允许 Ctrl+C 正常退出
-            logger.info("Server stopped by user.")
-            sys.exit(0)
-        except json.JSONDecodeError:
-            logger.error("Invalid JSON received")
-        except Exception as e:
-            # 只捕获常规异常，不捕获 SystemExit/KeyboardInterrupt
-            logger.error(f"Error: {e}")
+    logger.info(f"Inkeep MCP Server Started (concurrency {MAX_CONCURRENCY})")
+    # 可选的分阶段耗时指标（INKEEP_METRICS=log / jsonl:<path> / prometheus:<port>）
+    metrics.configure_from_env()
+
+    # tools/call 交给线程池执行，主线程只负责读取 stdin，
+    # 这样慢请求不会阻塞 ping / tools/list 以及其它并发的提问
+    executor = ThreadPoolExecutor(max_workers=max(1, MAX_CONCURRENCY))
+
+    if REFRESH_INTERVAL > 0:
+        refresher.start(REFRESH_INTERVAL)
+
+    try:
+        while True:
+            try:
+                line = sys.stdin.readline()
+                if not line:
+                    break
+
+                request = json.loads(line)
+
+                if request.get("method") == "tools/call":
+                    executor.submit(run_tool_call, request.get("id"), request.get("params"))
+                    continue
+
+                response = handle_request(request)
+                if response:
+                    write_message(response)
+
+            except json.JSONDecodeError:
+                logger.error("Invalid JSON received")
+            except Exception as e:
+                # 只捕获常规异常，不捕获 SystemExit/KeyboardInterrupt
+                logger.error(f"Error: {e}")
+    except KeyboardInterrupt:
+        # 允许 Ctrl+C 正常退出
+        logger.info("Server stopped by user.")
+        executor.shutdown(wait=False)
+        sys.exit(0)
+
+    # stdin 关闭后等待已提交的请求写回结果再退出
+    executor.shutdown(wait=True)
 
 if __name__ == "__main__":
     main()
@@ -1,73 +1,252 @@
 import os
 import sys
 import json
+import time
+import asyncio
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
 
 # 将项目根目录加入路径，以便导入 inkeep_core
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from inkeep_core.extractor import ConfigExtractor
-from inkeep_core.registry import SiteRegistry
+from inkeep_core.async_client import create_http_client
+from inkeep_core.async_extractor import AsyncConfigExtractor, HostLimiter
+from inkeep_core.scheduler import HostScheduler, HostThrottled
+from inkeep_core.script_cache import ScriptCache
 
-def check_site(url):
-    """检测单个站点是否接入 Inkeep"""
-    extractor = ConfigExtractor()
-    # 尝试根目录和 /docs
-    paths = ["", "/docs", "/introduction", "/home"]
-    
+# 尝试根目录和 /docs
+PATHS = ["", "/docs", "/introduction", "/home"]
+
+async def check_site(extractor, url):
+    """检测单个站点是否接入 Inkeep（各路径并发扫描，共享同一脚本的下载）"""
     parsed = urlparse(url)
     base = f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme else f"https://{url.strip('/')}"
-    
-    for path in paths:
-        target = base + path
-        # print(f"  [Checking] {target}")
-        config = extractor.scan(target)
-        if config:
-            return {"url": url, "detected_url": target, "found": True, "config": config}
-            
-    return {"url": url, "found": False}
+
+    script_tasks = {}
+    scans = {asyncio.ensure_future(extractor.scan(base + path, script_tasks)): base + path for path in PATHS}
+    throttled = None
+    try:
+        pending = set(scans)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    config = future.result()
+                except HostThrottled as e:
+                    throttled = e
+                    continue
+                if config:
+                    return {"url": url, "detected_url": scans[future], "found": True, "config": config}
+        # 被限流的路径结果未知，交给调用方重试而不是记为未接入
+        if throttled:
+            raise throttled
+        return {"url": url, "found": False}
+    finally:
+        for future in list(scans) + list(script_tasks.values()):
+            future.cancel()
+
+def read_urls(path):
+    """逐行读取输入（带序号），避免将超大域名列表一次性载入内存"""
+    with open(path, 'r') as f:
+        index = 0
+        for line in f:
+            line = line.strip()
+            if line:
+                yield index, line
+                index += 1
+
+class Checkpoint:
+    """
+    记录已完成的输入序号：watermark 之前全部完成，done 只保存 watermark 之后
+    乱序完成的少量序号，因此文件大小与输入规模无关。被限流的输入同样标记完成
+    （watermark 照常推进），另记入 retry，--resume 时重新扫描。
+    """
+    def __init__(self, path, input_path, interval=1.0):
+        self.path = path
+        self.input_path = input_path
+        self.interval = interval
+        self.watermark = 0
+        self.done = set()
+        self.retry = set()
+        self._last_save = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        if data.get("input") != os.path.abspath(self.input_path):
+            raise ValueError(f"Checkpoint {self.path} belongs to {data.get('input')}")
+        self.watermark = data["watermark"]
+        self.done = set(data["done"])
+        self.retry = set(data.get("retry", []))
+
+    def is_done(self, index):
+        if index in self.retry:
+            return False
+        return index < self.watermark or index in self.done
+
+    def mark(self, index, retry=False):
+        if retry:
+            self.retry.add(index)
+        else:
+            self.retry.discard(index)
+        if index >= self.watermark:
+            self.done.add(index)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+        if time.time() - self._last_save >= self.interval:
+            self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                "input": os.path.abspath(self.input_path),
+                "watermark": self.watermark,
+                "done": sorted(self.done),
+                "retry": sorted(self.retry)
+            }, f)
+        os.replace(tmp_path, self.path)
+        self._last_save = time.time()
+
+class ResultWriter:
+    """每完成一个站点就追加一行 JSONL，崩溃或中断时已完成的结果不会丢失"""
+    def __init__(self, path, append=False):
+        self.f = open(path, 'a' if append else 'w')
+        self.found = 0
+        self.throttled = 0
+
+    def write(self, result):
+        self.f.write(json.dumps(result) + "\n")
+        self.f.flush()
+        if result.get("found"):
+            self.found += 1
+        if str(result.get("error", "")).startswith("throttled"):
+            self.throttled += 1
+
+    def close(self):
+        self.f.close()
+
+async def worker(queue, extractor, writer, checkpoint):
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        index, url = item
+        try:
+            res = await check_site(extractor, url)
+            if res['found']:
+                print(f"✅ FOUND: {url} -> {res['detected_url']}", flush=True)
+            else:
+                print(f"⚪ Not found: {url}", flush=True)
+        except HostThrottled as exc:
+            # 结果未知：记录错误并放入 retry，--resume 时会重新扫描
+            print(f"⏳ Throttled: {url} ({exc})", flush=True)
+            writer.write({"url": url, "found": False, "error": f"throttled: {exc}"})
+            checkpoint.mark(index, retry=True)
+            continue
+        except Exception as exc:
+            print(f"❌ Error scanning {url}: {exc}", flush=True)
+            res = {"url": url, "found": False, "error": str(exc)}
+        writer.write(res)
+        checkpoint.mark(index)
+
+async def run(args):
+    checkpoint = Checkpoint(args.output + ".checkpoint", args.input)
+    if args.resume:
+        checkpoint.load()
+        print(f"↩️  Resuming after {checkpoint.watermark + len(checkpoint.done)} finished inputs"
+              f" ({len(checkpoint.retry)} throttled to retry)", flush=True)
+
+    http = create_http_client(max_connections=args.concurrency * 2)
+    # 跨站点共享的脚本判定缓存：同一 CDN/框架 bundle 只需下载扫描一次
+    script_cache = ScriptCache(cache_dir=args.script_cache_dir)
+    # 按主机限速：令牌桶 + 429/503 退避（遵守 Retry-After）+ 按主机延迟自适应超时
+    scheduler = HostScheduler(rate=args.rate, burst=max(1, int(args.rate * 2)), per_host=args.per_host)
+    extractor = AsyncConfigExtractor(http, HostLimiter(args.per_host), script_cache=script_cache, scheduler=scheduler)
+    writer = ResultWriter(args.output, append=args.resume)
+    scanned = 0
+
+    # 有界队列：读取速度受扫描速度约束，内存占用与输入规模无关
+    queue = asyncio.Queue(maxsize=args.concurrency * 2)
+    workers = [asyncio.ensure_future(worker(queue, extractor, writer, checkpoint)) for _ in range(args.concurrency)]
+    try:
+        for index, url in read_urls(args.input):
+            if checkpoint.is_done(index):
+                continue
+            await queue.put((index, url))
+            scanned += 1
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for w in workers:
+            w.cancel()
+        checkpoint.save()
+        writer.close()
+        await http.aclose()
+        print(f"🗂️  Script cache: {script_cache.stats()}", flush=True)
+
+    return scanned, writer.found, writer.throttled
+
+def convert(jsonl_path, output):
+    """将 JSONL 结果转换为旧版 scan_results.json 格式（仅保留命中的站点，按 URL 去重）"""
+    results = {}
+    with open(jsonl_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中断时可能留下不完整的最后一行
+                continue
+            if record.get("found"):
+                results[record["url"]] = record
+    with open(output, 'w') as f:
+        json.dump(list(results.values()), f, indent=2)
+    return len(results)
 
 def main():
     parser = argparse.ArgumentParser(description="Batch Inkeep Detector")
-    parser.add_argument("input", help="File with list of URLs/domains")
-    parser.add_argument("--output", default="scanner/scan_results.json", help="Output JSON file")
-    parser.add_argument("--threads", type=int, default=10, help="Max threads")
-    
+    parser.add_argument("input", help="File with list of URLs/domains (or a JSONL result file with --convert)")
+    parser.add_argument("--output", help="Output file (default: scanner/scan_results.jsonl, or .json with --convert)")
+    parser.add_argument("--resume", action="store_true", help="Skip inputs recorded in the output's checkpoint and append to it")
+    parser.add_argument("--convert", action="store_true", help="Convert a JSONL result file to the scan_results.json format")
+    parser.add_argument("--concurrency", "--threads", dest="concurrency", type=int, default=50, help="Max sites scanned at once")
+    parser.add_argument("--per-host", type=int, default=4, help="Max concurrent requests per host")
+    parser.add_argument("--rate", type=float, default=5.0, help="Max requests per second per host (default: 5)")
+    parser.add_argument("--script-cache-dir", help="Persist script scan verdicts in this directory across runs")
+
     args = parser.parse_args()
-    
+
     if not os.path.exists(args.input):
         print(f"Error: File {args.input} not found")
         return
 
-    with open(args.input, 'r') as f:
-        urls = [line.strip() for line in f if line.strip()]
-
-    print(f"🚀 Starting scan for {len(urls)} sites using {args.threads} threads...")
-    
-    results = []
-    with ThreadPoolExecutor(max_workers=args.threads) as executor:
-        future_to_url = {executor.submit(check_site, url): url for url in urls}
-        
-        for future in as_completed(future_to_url):
-            url = future_to_url[future]
-            try:
-                res = future.result()
-                if res['found']:
-                    print(f"✅ FOUND: {url} -> {res['detected_url']}")
-                    results.append(res)
-                else:
-                    print(f"⚪ Not found: {url}")
-            except Exception as exc:
-                print(f"❌ Error scanning {url}: {exc}")
-
-    # 保存结果
-    with open(args.output, 'w') as f:
-        json.dump(results, f, indent=2)
-        
-    print(f"\n📊 Scan finished. Found {len(results)} Inkeep sites.")
+    if args.convert:
+        output = args.output or "scanner/scan_results.json"
+        count = convert(args.input, output)
+        print(f"📦 Converted {count} found sites to {output}")
+        return
+
+    args.output = args.output or "scanner/scan_results.jsonl"
+
+    print(f"🚀 Starting scan of {args.input} (concurrency {args.concurrency}, {args.per_host} per host)...")
+
+    try:
+        scanned, found, throttled = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("\n⛔ Interrupted. Run again with --resume to continue.")
+        return
+
+    print(f"\n📊 Scan finished. Scanned {scanned} sites, found {found} Inkeep sites.")
     print(f"Results saved to {args.output}")
+    if throttled:
+        print(f"⏳ {throttled} sites were throttled; run again with --resume to retry them.")
 
 if __name__ == "__main__":
     main()
@@ -1,3 +1,4 @@
+// Generated from inkeep_core/sites.json by github_miner/miner.py. Do not edit by hand.
 export interface SiteConfig {
   url: string;
   description: string;